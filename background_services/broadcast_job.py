@@ -0,0 +1,214 @@
+import asyncio
+import contextvars
+import html
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, Optional
+
+import sentry_sdk
+from telegram import Bot
+from telegram.constants import ParseMode
+from telegram.error import TelegramError
+
+from database_models.broadcast import Broadcast
+from database_models.db_executor import DbExecutor
+from enums.broadcast_status import BroadcastStatus
+from utils.outbound_queue import OutboundQueue
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastJob:
+    """
+    выполняет рассылку из редиса кусками по CHUNK_SIZE получателей.
+    пока рассылка идет, она держит lock в редисе, так что одну и ту же
+    рассылку не может одновременно вести другая реплика.
+    прогресс админ видит в одном сообщении, которое периодически обновляется
+    """
+
+    CHUNK_SIZE = 100
+    LOCK_KEY_PREFIX = "submgr:broadcast_lock:"
+    LOCK_SECONDS = 60
+    PROGRESS_INTERVAL_SECONDS = 5
+
+    # сколько неудачных получателей показывать в отчете
+    MAX_FAILED_IN_REPORT = 50
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    running: Dict[int, "BroadcastJob"] = {}
+
+    bot: Bot
+    broadcast: Broadcast
+
+    def __init__(self, bot: Bot, broadcast: Broadcast):
+        self.bot = bot
+        self.broadcast = broadcast
+        self.__owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.__task: Optional[asyncio.Task] = None
+        self.__reported_at = 0.0
+
+    @staticmethod
+    def lock_key(broadcast_id: int) -> str:
+        return f"{BroadcastJob.LOCK_KEY_PREFIX}{broadcast_id}"
+
+    @staticmethod
+    def is_running(broadcast_id: int) -> bool:
+        return bool(Broadcast.db().exists(BroadcastJob.lock_key(broadcast_id)))
+
+    @staticmethod
+    async def start(
+        bot: Bot, text: str, admin_chat_id: int, sub_id: Optional[int] = None
+    ) -> Broadcast:
+        broadcast = await DbExecutor.run(Broadcast.create, text, admin_chat_id, sub_id)
+        await BroadcastJob.resume(bot, broadcast)
+        return broadcast
+
+    @staticmethod
+    async def resume(bot: Bot, broadcast: Broadcast):
+        if broadcast.effective_status is BroadcastStatus.done:
+            raise RuntimeError(f"Broadcast {broadcast.id} is already done")
+
+        job = BroadcastJob(bot, broadcast)
+        if not await DbExecutor.run(job.__lock):
+            raise RuntimeError(f"Broadcast {broadcast.id} is already running")
+
+        BroadcastJob.running[broadcast.id] = job
+
+        # рассылка не должна жить в контексте апдейта, который ее запустил
+        job.__task = asyncio.get_running_loop().create_task(
+            job.__run(), context=contextvars.Context()
+        )
+
+    @staticmethod
+    def report(broadcast: Broadcast) -> str:
+        is_running = BroadcastJob.is_running(broadcast.id)
+
+        if broadcast.effective_status is BroadcastStatus.done:
+            message = f"рассылка {broadcast.id}: готово ✅\n\n"
+        elif is_running:
+            message = f"рассылка {broadcast.id} идет 📨\n\n"
+        else:
+            reason = html.escape(broadcast.error or "процесс был перезапущен")
+            message = (
+                f"рассылка {broadcast.id} остановилась на пользователе "
+                f"{broadcast.cursor}: {reason} ❌\n"
+                f"продолжить: /broadcast_resume {broadcast.id}\n\n"
+            )
+
+        message += (
+            f"✅ отправлено: {broadcast.sent}\n"
+            f"❌ не удалось отправить: {broadcast.failed}"
+        )
+
+        unknown = broadcast.unknown
+        if unknown > 0 and not is_running:
+            message += f"\n❔ неизвестно, повторно не отправляется: {unknown}"
+
+        if broadcast.failed:
+            failed = broadcast.get_failed_recipients(BroadcastJob.MAX_FAILED_IN_REPORT)
+            message += "\n\n" + "\n".join(f"- {i}" for i in failed)
+
+            hidden = broadcast.failed - len(failed)
+            if hidden > 0:
+                message += f"\n... и еще {hidden}"
+
+        return message
+
+    def __lock(self) -> bool:
+        return bool(
+            Broadcast.db().set(
+                BroadcastJob.lock_key(self.broadcast.id),
+                self.__owner,
+                nx=True,
+                ex=BroadcastJob.LOCK_SECONDS,
+            )
+        )
+
+    def __unlock(self):
+        release = Broadcast.db().register_script(BroadcastJob.RELEASE_SCRIPT)
+        release(keys=[BroadcastJob.lock_key(self.broadcast.id)], args=[self.__owner])
+
+    async def __run(self):
+        broadcast = self.broadcast
+
+        try:
+            if broadcast.effective_status is not BroadcastStatus.running:
+                await DbExecutor.run(broadcast.set_status, BroadcastStatus.running)
+
+            await self.__report_progress(force=True)
+
+            while True:
+                recipients = await DbExecutor.run(
+                    broadcast.next_recipients, BroadcastJob.CHUNK_SIZE
+                )
+                if not recipients:
+                    break
+
+                claimed = await DbExecutor.run(broadcast.claim, recipients)
+                results = await OutboundQueue.send_many(
+                    self.bot, claimed, broadcast.text
+                )
+                await DbExecutor.run(
+                    self.__complete,
+                    recipients[-1],
+                    [(i.chat_id, i.ok) for i in results],
+                )
+                await self.__report_progress()
+
+            await DbExecutor.run(broadcast.set_status, BroadcastStatus.done)
+        except Exception as e:
+            logger.error(
+                f"[BroadcastJob] {broadcast.id} stopped at user {broadcast.cursor}: {e}"
+            )
+            sentry_sdk.capture_exception(e)
+            await DbExecutor.run(broadcast.set_status, BroadcastStatus.stopped, str(e))
+        finally:
+            await DbExecutor.run(self.__unlock)
+            BroadcastJob.running.pop(broadcast.id, None)
+
+        await self.__report_progress(force=True)
+
+    def __complete(self, cursor: int, results):
+        self.broadcast.complete(cursor, results)
+        Broadcast.db().expire(
+            BroadcastJob.lock_key(self.broadcast.id), BroadcastJob.LOCK_SECONDS
+        )
+
+    async def __report_progress(self, force: bool = False):
+        now = time.monotonic()
+        if (
+            not force
+            and now - self.__reported_at < BroadcastJob.PROGRESS_INTERVAL_SECONDS
+        ):
+            return
+
+        self.__reported_at = now
+        broadcast = self.broadcast
+        text = await DbExecutor.run(BroadcastJob.report, broadcast)
+
+        try:
+            if broadcast.progress_message_id is None:
+                message = await self.bot.send_message(
+                    broadcast.admin_chat_id, text, parse_mode=ParseMode.HTML
+                )
+                broadcast.progress_message_id = message.message_id
+                await DbExecutor.run(broadcast.save)
+            else:
+                await self.bot.edit_message_text(
+                    text,
+                    chat_id=broadcast.admin_chat_id,
+                    message_id=broadcast.progress_message_id,
+                    parse_mode=ParseMode.HTML,
+                )
+        except TelegramError as e:
+            # "message is not modified" и подобное не должно ронять рассылку
+            logger.warning(f"[BroadcastJob] progress report failed: {e}")
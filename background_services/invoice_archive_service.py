@@ -0,0 +1,67 @@
+import datetime
+import logging
+import time
+
+from background_services.repeating_service import RepeatingService
+from database_models.base_model import BaseModel, DEFAULT_CHUNK_SIZE
+from database_models.due_invoice_index import DueInvoiceIndex
+from database_models.invoice import Invoice
+from database_models.invoice_archive import InvoiceArchive
+
+logger = logging.getLogger(__name__)
+
+
+class InvoiceArchiveService(RepeatingService):
+    """
+    переносит оплаченные счета старше ARCHIVE_AFTER_DAYS дней в InvoiceArchive
+    и удаляет их из редиса. счет удаляется только после того, как он записан на диск
+    """
+
+    ARCHIVE_AFTER_DAYS = 30
+
+    def __init__(self):
+        now = datetime.datetime.now()
+        super().__init__(
+            12 * 60 * 60, datetime.datetime(now.year, now.month, now.day, 12, 0, 0)
+        )
+        self.name = "InvoiceArchiveService"
+
+    def do_work(self):
+        started = time.monotonic()
+        archive_before = datetime.date.today() - datetime.timedelta(
+            days=InvoiceArchiveService.ARCHIVE_AFTER_DAYS
+        )
+
+        # заархивированные счета пропадают из выборки,
+        # поэтому каждый раз берем первую страницу
+        query = Invoice.find(
+            (Invoice.paid == True) & (Invoice.pay_till < archive_before)
+        ).sort_by("invoice_id")
+
+        archived = 0
+        previous_ids = None
+        while True:
+            invoices = query.page(0, DEFAULT_CHUNK_SIZE)
+            if not invoices:
+                break
+
+            invoice_ids = [i.invoice_id for i in invoices]
+            if invoice_ids == previous_ids:
+                raise RuntimeError("Archived invoices are still in the search index")
+            previous_ids = invoice_ids
+
+            pipeline = BaseModel.db().pipeline(transaction=True)
+            InvoiceArchive.append(invoices, pipeline)
+            for invoice in invoices:
+                pipeline.delete(invoice.key())
+                DueInvoiceIndex.remove(invoice.invoice_id, pipeline)
+            pipeline.execute()
+
+            archived += len(invoices)
+
+        elapsed = time.monotonic() - started
+        invoices_per_second = archived / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"[{self.name}] {archived} invoices archived in {elapsed:.2f}s "
+            f"({invoices_per_second:.1f} invoices/s)"
+        )
@@ -1,31 +1,41 @@
 import datetime
 import logging
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from background_services.repeating_service import RepeatingService
+from database_models.batch_writer import BatchWriter
 from database_models.invoice import Invoice, InvoiceSubscriptionInfo
+from database_models.invoice_id_allocator import InvoiceIdAllocator
 from database_models.subscription import Subscription
+from database_models.subscription_catalog import SubscriptionCatalog
 from database_models.user import User
 from enums.list_type import ListType
 from enums.subscription_type import SubscriptionType
+from utils.currency_converter import CurrencyConverter
 
 
 class InvoiceService(RepeatingService):
-    def __init__(self):
+    batch_size: int
+
+    def __init__(self, batch_size: int = BatchWriter.DEFAULT_BATCH_SIZE):
         now = datetime.datetime.now()
         super().__init__(
             24 * 60 * 60, datetime.datetime(now.year, now.month, now.day, 11, 55, 0)
         )
         self.name = "InvoiceService"
+        self.batch_size = batch_size
 
     def do_work(self):
-        # булы оно не индексит
+        # все счета и изменения биллинга за прогон пишутся пачками
+        with BatchWriter(self.name, self.batch_size):
+            InvoiceService.__create_invoices(self.batch_size)
+
+    @staticmethod
+    def __create_invoices(chunk_size: int):
         subs: List[Subscription] = [
-            i for i in Subscription.find().all() if i and i.is_active
+            i for i in SubscriptionCatalog.all() if i and i.is_active
         ]
 
-        users: List[User] = [i for i in User.find().all()]
-
         if not subs:
             return
 
@@ -37,7 +47,36 @@ def do_work(self):
                 continue
             elif sub.reserve:
                 sub.billing.next_invoice_date = datetime.date.today()
-                sub.save()
+                sub.commit_path(
+                    "$.billing.next_invoice_date", sub.billing.next_invoice_date
+                )
+
+        # все цены переводятся в евро одним махом
+        pure_prices: Dict[int, float] = dict(
+            zip(
+                [sub.id for sub in subs],
+                CurrencyConverter.convert_many(
+                    [
+                        (sub.billing.price, sub.billing.effective_currency)
+                        for sub in subs
+                    ]
+                ),
+            )
+        )
+
+        # пользователи читаются страницами и забываются после обработки,
+        # чтобы прогон не держал в памяти всех сразу
+        for users in User.iterate_chunks(chunk_size=chunk_size):
+            users = User.track(users)
+            InvoiceService.__invoice_users(users, pure_prices)
+            InvoiceService.__update_individual_billings(subs, users)
+            User.untrack(users)
+
+        InvoiceService.__update_group_billings(subs)
+
+    @staticmethod
+    def __invoice_users(users: List[User], pure_prices: Dict[int, float]):
+        pending_invoices: List[Tuple[User, List[InvoiceSubscriptionInfo]]] = []
 
         for user in users:
             user_subs: List[Subscription] = user.get_subs(ListType.MY_SUBS)
@@ -57,50 +96,63 @@ def do_work(self):
                             sub_id=sub.id,
                             period_start_date=sub.payday(user.id),
                             period_end_date=sub.shifted_payday(1, user.id),
-                            price=sub.price_in_eur,
+                            price=sub.price_per_member(pure_prices[sub.id]),
                         )
                     )
 
             if invoice_info:
-                Invoice(
-                    invoice_id=Invoice.generate_invoice_id(),
-                    user=user.id,
-                    date=datetime.date.today(),
-                    pay_till=datetime.date.today() + datetime.timedelta(days=2),
-                    subscriptions=invoice_info,
-                    paid=False,
-                ).save()
+                pending_invoices.append((user, invoice_info))
+
+        # номера для всех счетов страницы резервируются одним запросом
+        invoice_ids = InvoiceIdAllocator.reserve(len(pending_invoices))
 
-        InvoiceService.__update_subscriptions_billings(subs, users)
+        for invoice_id, (user, invoice_info) in zip(invoice_ids, pending_invoices):
+            Invoice(
+                invoice_id=invoice_id,
+                user=user.id,
+                date=datetime.date.today(),
+                pay_till=datetime.date.today() + datetime.timedelta(days=2),
+                subscriptions=invoice_info,
+                paid=False,
+            ).commit()
 
     @staticmethod
-    def __update_subscriptions_billings(subs: List[Subscription], users: List[User]):
+    def __update_individual_billings(subs: List[Subscription], users: List[User]):
         today = datetime.date.today()
         for sub in subs:
-            if sub.reserve and sub.free_slots > 0:
+            if sub.effective_type is not SubscriptionType.individual:
                 continue
-            elif sub.reserve and sub.effective_type is SubscriptionType.individual:
-                raise RuntimeError(
-                    f"sub {sub.id} cannot be individual and reserved at the same time"
+
+            for user in [i for i in users if i.id in sub.billing.members]:
+                if sub.payday(user.id) > today:
+                    continue
+                user.set_sub_period(
+                    sub.id, sub.shift_date(user.get_sub_period(sub.id), 1)
                 )
-            match sub.effective_type:
-                case SubscriptionType.group:
-                    if sub.payday() > today:
-                        continue
-                    sub.billing.next_invoice_date = sub.shifted_payday(1)
-                    sub.save()
-
-                case SubscriptionType.individual:
-                    for user in [i for i in users if i.id in sub.billing.members]:
-                        if sub.payday(user.id) > today:
-                            continue
-                        user.set_sub_period(
-                            sub.id, sub.shift_date(user.get_sub_period(sub.id), 1)
-                        )
+
+    @staticmethod
+    def __update_group_billings(subs: List[Subscription]):
+        # дата групповой подписки общая для всех, поэтому сдвигается
+        # только после того, как счета выставлены всем участникам
+        today = datetime.date.today()
+        for sub in subs:
+            if sub.reserve and sub.free_slots > 0:
+                continue
+            if sub.effective_type is not SubscriptionType.group:
+                continue
+            if sub.payday() > today:
+                continue
+
+            sub.billing.next_invoice_date = sub.shifted_payday(1)
+            sub.commit_path(
+                "$.billing.next_invoice_date", sub.billing.next_invoice_date
+            )
 
     @staticmethod
     def invoice_individual_sub_member(sub: Subscription, user_id: int):
-        user: User = User.find(User.id == user_id).all()[0]
+        user: Optional[User] = User.load(user_id)
+        if user is None:
+            raise RuntimeError(f"User {user_id} not found")
 
         if sub.effective_type is not SubscriptionType.individual:
             raise RuntimeError(f"Subscription {sub.id} is not individual")
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Optional
+
+import sentry_sdk
+
+from database_models.base_model import BaseModel
+from database_models.db_executor import DbExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """
+    выбор лидера среди реплик бота через lease-ключ в редисе.
+    лидер продлевает lease, остальные пытаются его захватить,
+    если лидер умер или отпустил ключ
+    """
+
+    KEY = "submgr:leader"
+    LEASE_SECONDS = 15
+    RENEW_INTERVAL_SECONDS = 5
+
+    RENEW_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    replica_id: str
+
+    def __init__(self):
+        self.replica_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.__renewed_at: Optional[float] = None
+        self.__task: Optional[asyncio.Task] = None
+        self.__renew = BaseModel.db().register_script(LeaderElection.RENEW_SCRIPT)
+        self.__release = BaseModel.db().register_script(LeaderElection.RELEASE_SCRIPT)
+
+    @property
+    def is_leader(self) -> bool:
+        # если продлить lease не получилось, считаем, что он уже истек
+        return (
+            self.__renewed_at is not None
+            and time.monotonic() - self.__renewed_at < LeaderElection.LEASE_SECONDS
+        )
+
+    def start(self):
+        self.__task = asyncio.get_running_loop().create_task(self.__run())
+
+    async def stop(self):
+        if self.__task is not None:
+            self.__task.cancel()
+            await asyncio.gather(self.__task, return_exceptions=True)
+
+        if self.__renewed_at is None:
+            return
+
+        self.__renewed_at = None
+
+        try:
+            await DbExecutor.run(
+                self.__release, keys=[LeaderElection.KEY], args=[self.replica_id]
+            )
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
+
+    async def __run(self):
+        while True:
+            try:
+                # запросы к редису не должны останавливать апдейты
+                await DbExecutor.run(self.__tick)
+            except Exception as e:
+                sentry_sdk.capture_exception(e)
+
+            await asyncio.sleep(LeaderElection.RENEW_INTERVAL_SECONDS)
+
+    def __tick(self):
+        lease_ms = LeaderElection.LEASE_SECONDS * 1000
+        attempt_started = time.monotonic()
+
+        if self.__renewed_at is not None:
+            renewed = self.__renew(
+                keys=[LeaderElection.KEY], args=[self.replica_id, lease_ms]
+            )
+            if renewed:
+                self.__renewed_at = attempt_started
+                return
+
+            self.__renewed_at = None
+            logger.warning(f"[LeaderElection] {self.replica_id} lost leadership")
+
+        acquired = BaseModel.db().set(
+            LeaderElection.KEY, self.replica_id, nx=True, px=lease_ms
+        )
+        if acquired:
+            self.__renewed_at = attempt_started
+            logger.info(f"[LeaderElection] {self.replica_id} is the leader now")
@@ -1,5 +1,6 @@
 import datetime
 from enum import Enum
+from typing import Awaitable, Callable, List, Optional, Tuple
 
 import sentry_sdk
 import telegram
@@ -7,11 +8,14 @@
 from telegram.constants import ParseMode
 
 from background_services.repeating_service import RepeatingService
+from database_models.db_executor import DbExecutor
+from database_models.due_invoice_index import DueInvoiceIndex
 from database_models.invoice import Invoice
 from models.bot_context import BotContext
 from modules.invoice_module import InvoiceModule
 from utils.callback_utils import ConfigurableCallbackList
 from utils.datetime_utils import DateTimeUtils
+from utils.outbound_queue import OutboundQueue
 
 
 class DelayType(Enum):
@@ -52,56 +56,86 @@ def __init__(self, bot: Bot):
         self.bot = bot
 
     async def do_work_async(self):
-        invoices = [i for i in Invoice.find().all() if not i.paid]
-        if not invoices:
-            return
-
-        for invoice in invoices:
-            try:
-                if invoice.pay_till == datetime.date.today():
-                    await ReminderService.send_reminder(
-                        self.bot, invoice, DelayType.PayDay
-                    )
-                elif invoice.pay_till == datetime.date.today() - datetime.timedelta(
-                    days=2
-                ):
-                    await ReminderService.send_reminder(
-                        self.bot, invoice, DelayType.TwoDaysPast
-                    )
-                elif invoice.pay_till == datetime.date.today() + datetime.timedelta(
-                    days=2
-                ):
-                    await ReminderService.send_reminder(
-                        self.bot, invoice, DelayType.TwoDaysBefore
-                    )
-                else:
+        due = await DbExecutor.run(ReminderService.__load_due)
+
+        jobs = [
+            (invoice.user, self.__reminder_job(invoice, pay_till))
+            for invoice, pay_till in due
+        ]
+
+        for result in await OutboundQueue.deliver(jobs):
+            if result.error is not None:
+                sentry_sdk.capture_exception(result.error)
+
+    @staticmethod
+    def __load_due() -> List[Tuple[Invoice, datetime.date]]:
+        today = datetime.date.today()
+        due = DueInvoiceIndex.get_due(
+            [
+                today + datetime.timedelta(days=2),
+                today,
+                today - datetime.timedelta(days=2),
+            ]
+        )
+
+        output = []
+        for pay_till, invoice_ids in due.items():
+            for invoice_id in invoice_ids:
+                invoice = Invoice.load(invoice_id)
+
+                # счет могли оплатить или поправить мимо бота
+                if invoice is None or invoice.paid or invoice.pay_till != pay_till:
+                    ReminderService.__heal_index(invoice_id, invoice)
                     continue
-            except Exception as e:
-                sentry_sdk.capture_exception(e)
-                continue
+
+                output.append((invoice, pay_till))
+
+        return output
+
+    def __reminder_job(
+        self, invoice: Invoice, pay_till: datetime.date
+    ) -> Callable[[], Awaitable[None]]:
+        delay_type = ReminderService.get_delay_type(pay_till)
+        return lambda: ReminderService.send_reminder(self.bot, invoice, delay_type)
+
+    @staticmethod
+    def __heal_index(invoice_id: str, invoice: Optional[Invoice]):
+        if invoice is None:
+            DueInvoiceIndex.remove(invoice_id)
+        else:
+            DueInvoiceIndex.update(invoice)
+
+    @staticmethod
+    def get_delay_type(pay_till: datetime.date) -> Optional[DelayType]:
+        today = datetime.date.today()
+
+        if pay_till == today:
+            return DelayType.PayDay
+        elif pay_till == today - datetime.timedelta(days=2):
+            return DelayType.TwoDaysPast
+        elif pay_till == today + datetime.timedelta(days=2):
+            return DelayType.TwoDaysBefore
+
+        return None
 
     @staticmethod
     async def remind_invoice(
         ctx: BotContext, invoice_id: str, update_message: bool
     ) -> bool:
-        invoices = Invoice.find(Invoice.invoice_id == invoice_id).all()
-        if not invoices:
+        invoice = await Invoice.aload(invoice_id)
+        if not invoice:
             return False
 
-        invoice = invoices[0]
+        delay_type = ReminderService.get_delay_type(invoice.pay_till)
+        if delay_type is None:
+            return False
 
-        if invoice.pay_till == datetime.date.today():
-            await ReminderService.send_reminder(
-                None, invoice, DelayType.PayDay, ctx, update_message
-            )
-        elif invoice.pay_till == datetime.date.today() - datetime.timedelta(days=2):
-            await ReminderService.send_reminder(
-                None, invoice, DelayType.TwoDaysPast, ctx, update_message
-            )
-        elif invoice.pay_till == datetime.date.today() + datetime.timedelta(days=2):
+        try:
             await ReminderService.send_reminder(
-                None, invoice, DelayType.TwoDaysBefore, ctx, update_message
+                None, invoice, delay_type, ctx, update_message
             )
+        except Exception as e:
+            sentry_sdk.capture_exception(e)
 
         return False
 
@@ -115,7 +149,11 @@ async def send_reminder(
     ):
         invoice_phrase = invoice.invoice_id
         sub_phrase = "\n".join(
-            [InvoiceModule.generate_sub_phrase(i) for i in invoice.subscriptions]
+            await DbExecutor.run(
+                lambda: [
+                    InvoiceModule.generate_sub_phrase(i) for i in invoice.subscriptions
+                ]
+            )
         )
         pay_till_phrase = DateTimeUtils.day_and_month_in_words(invoice.pay_till)
         sum_phrase = f"{invoice.total_price:.2f}"
@@ -157,16 +195,13 @@ async def send_reminder(
             else None
         )
 
-        try:
-            if not update_message or not ctx:
-                await bot.send_message(
-                    invoice.user,
-                    message,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=keyboard,
-                    disable_web_page_preview=True,
-                )
-            else:
-                await ctx.update_message(message, reply=keyboard)
-        except Exception as e:
-            sentry_sdk.capture_exception(e)
+        if not update_message or not ctx:
+            await bot.send_message(
+                invoice.user,
+                message,
+                parse_mode=ParseMode.HTML,
+                reply_markup=keyboard,
+                disable_web_page_preview=True,
+            )
+        else:
+            await ctx.update_message(message, reply=keyboard)
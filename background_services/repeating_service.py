@@ -1,60 +1,59 @@
 import asyncio
-import logging
+import contextvars
+from concurrent.futures import Executor
 from datetime import datetime, timedelta
-from threading import Thread
 
-import sentry_sdk
-
-import debug
+from database_models.identity_map import IdentityMap
 
 
 class RepeatingService:
+    """
+    сервис, который запускается каждые interval_seconds,
+    начиная со времени start_time (берется только время, без даты)
+    """
+
     name: str = "RepeatingService"
-    _thread: Thread
 
     def __init__(self, interval_seconds: int, start_time: datetime):
         self.start_time = start_time
         self.interval_seconds = interval_seconds
-        self._thread = Thread(target=asyncio.run, args=(self.__run(),))
-
-    def start(self):
-        self._thread.start()
 
     def do_work(self):
         return
 
     async def do_work_async(self):
+        """
+        выполняется на event loop бота, запросы к редису отсюда - через DbExecutor
+        """
         return
 
-    async def __run(self):
-        # Расчет времени до следующего запуска
-        now = datetime.now()
-        future = datetime(
-            now.year, now.month, now.day, self.start_time.hour, self.start_time.minute
-        )
+    @property
+    def interval(self) -> timedelta:
+        return timedelta(seconds=self.interval_seconds)
 
-        if now > future:
-            # Если время уже прошло, переходим на следующий день
-            future += timedelta(days=1)
+    def last_run_time(self, moment: datetime) -> datetime:
+        """
+        последний запуск по расписанию, который был не позже moment
+        """
+        run_time = datetime.combine(moment.date(), self.start_time.time())
 
-        target_time = future - now
+        while run_time > moment:
+            run_time -= self.interval
 
-        logging.info(
-            f"[{self.name}] waiting for {target_time}\nfuture: {future}\nnow: {now}"
-        )
+        while run_time + self.interval <= moment:
+            run_time += self.interval
 
-        # Ожидание до начала времени
+        return run_time
 
-        if debug.debug:
-            logging.info("DEBUG: skipping waiting\n")
-        else:
-            await asyncio.sleep(target_time.total_seconds())
+    def next_run_time(self, moment: datetime) -> datetime:
+        return self.last_run_time(moment) + self.interval
 
-        try:
+    async def run(self, executor: Executor):
+        """
+        синхронная работа выполняется в executor, чтобы не блокировать event loop
+        """
+        with IdentityMap(self.name):
             await self.do_work_async()
-            self.do_work()
-            print(f"work {self.name} complete")
-            await asyncio.sleep(self.interval_seconds)
-        except Exception as e:
-            sentry_sdk.capture_exception(e)
-            raise
+            await asyncio.get_running_loop().run_in_executor(
+                executor, contextvars.copy_context().run, self.do_work
+            )
@@ -34,3 +34,5 @@ def do_work(self):
             except Exception as e:
                 sentry_sdk.capture_exception(e)
                 continue
+
+        CurrencyConverter.invalidate()
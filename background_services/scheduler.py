@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import sentry_sdk
+
+import debug
+from background_services.leader_election import LeaderElection
+from background_services.repeating_service import RepeatingService
+from database_models.base_model import BaseModel
+from database_models.db_executor import DbExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    запускает все фоновые сервисы на event loop бота.
+    синхронная работа сервисов выполняется в одном рабочем потоке,
+    а запросы самого планировщика к редису - через DbExecutor,
+    время последнего запуска хранится в редисе, чтобы после рестарта
+    пропущенные запуски выполнились сразу.
+    сервисы работают только на реплике, которая сейчас лидер.
+    перед запуском слот расписания занимается в редисе, так что после смены
+    лидера тот же слот не выполнится второй раз
+    """
+
+    LAST_RUN_KEY = "submgr:scheduler:last_run"
+    CLAIM_KEY_PREFIX = "submgr:scheduler:claim:"
+    MAX_JITTER_SECONDS = 60
+
+    # на случай перевода часов не спим дольше этого
+    MAX_SLEEP_SECONDS = 60
+
+    services: List[RepeatingService]
+    election: LeaderElection
+
+    def __init__(self, services: List[RepeatingService], election: LeaderElection):
+        self.services = services
+        self.election = election
+        self.__next_runs: Dict[str, datetime] = {}
+        self.__running: Dict[str, asyncio.Task] = {}
+        self.__executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="background_services"
+        )
+        self.__task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.__task = asyncio.get_running_loop().create_task(self.__run())
+
+    async def stop(self):
+        tasks = [self.__task, *self.__running.values()]
+        tasks = [i for i in tasks if i is not None and not i.done()]
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.__executor.shutdown(wait=False)
+
+    async def __run(self):
+        is_leader = False
+
+        while True:
+            now = datetime.now()
+
+            if not self.election.is_leader:
+                if is_leader:
+                    logger.warning("[Scheduler] not a leader anymore, pausing")
+                    await self.__cancel_running()
+                is_leader = False
+                await asyncio.sleep(LeaderElection.RENEW_INTERVAL_SECONDS)
+                continue
+
+            if not is_leader:
+                # другая реплика могла не успеть что-то запустить перед смертью
+                is_leader = True
+                self.__plan(now, await DbExecutor.run(Scheduler.__load_last_runs))
+
+            for service in self.services:
+                if self.__next_runs[service.name] > now:
+                    continue
+
+                await self.__launch(service)
+                self.__next_runs[service.name] = Scheduler.__with_jitter(
+                    service.next_run_time(now)
+                )
+
+            sleep_seconds = (min(self.__next_runs.values()) - now).total_seconds()
+            await asyncio.sleep(min(max(sleep_seconds, 0), Scheduler.MAX_SLEEP_SECONDS))
+
+    def __plan(self, now: datetime, last_runs: Dict[str, datetime]):
+        for service in self.services:
+            self.__next_runs[service.name] = Scheduler.__first_run_time(
+                service, last_runs.get(service.name), now
+            )
+            logger.info(f"[{service.name}] next run: {self.__next_runs[service.name]}")
+
+    async def __launch(self, service: RepeatingService):
+        running = self.__running.get(service.name)
+        if running is not None and not running.done():
+            logger.warning(f"[{service.name}] previous run is not finished, skipping")
+            return
+
+        claim_key = await DbExecutor.run(Scheduler.__claim, service, datetime.now())
+        if claim_key is None:
+            logger.warning(f"[{service.name}] slot is already claimed, skipping")
+            return
+
+        self.__running[service.name] = asyncio.get_running_loop().create_task(
+            self.__execute(service, claim_key)
+        )
+
+    async def __cancel_running(self):
+        # синхронная часть в рабочем потоке доработает сама,
+        # но ее результат и следующие шаги сервиса уже не выполнятся
+        tasks = [i for i in self.__running.values() if not i.done()]
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.__running.clear()
+
+    async def __execute(self, service: RepeatingService, claim_key: str):
+        started = datetime.now()
+
+        try:
+            await service.run(self.__executor)
+        except asyncio.CancelledError:
+            # слот не освобождаем: работа могла успеть выполниться частично
+            raise
+        except Exception as e:
+            logger.error(f"[{service.name}] failed: {e}")
+            sentry_sdk.capture_exception(e)
+            # упавший слот можно повторить
+            await DbExecutor.run(BaseModel.db().delete, claim_key)
+            return
+
+        await DbExecutor.run(
+            BaseModel.db().hset,
+            Scheduler.LAST_RUN_KEY,
+            service.name,
+            started.isoformat(),
+        )
+        logger.info(f"[{service.name}] work complete in {datetime.now() - started}")
+
+    @staticmethod
+    def __claim(service: RepeatingService, now: datetime) -> Optional[str]:
+        """
+        занимает текущий слот расписания сервиса, возвращает ключ или None,
+        если слот уже занят
+        """
+        slot = service.last_run_time(now)
+        claim_key = f"{Scheduler.CLAIM_KEY_PREFIX}{service.name}:{slot.isoformat()}"
+
+        claimed = BaseModel.db().set(
+            claim_key,
+            datetime.now().isoformat(),
+            nx=True,
+            ex=service.interval_seconds * 2,
+        )
+        return claim_key if claimed else None
+
+    @staticmethod
+    def __first_run_time(
+        service: RepeatingService, last_run: Optional[datetime], now: datetime
+    ) -> datetime:
+        if debug.debug:
+            logger.info(f"DEBUG: [{service.name}] skipping waiting")
+            return now
+
+        missed_run = service.last_run_time(now)
+        if last_run is not None and last_run < missed_run:
+            logger.info(f"[{service.name}] missed run at {missed_run}, catching up")
+            return now
+
+        return Scheduler.__with_jitter(service.next_run_time(now))
+
+    @staticmethod
+    def __with_jitter(run_time: datetime) -> datetime:
+        return run_time + timedelta(
+            seconds=random.uniform(0, Scheduler.MAX_JITTER_SECONDS)
+        )
+
+    @staticmethod
+    def __load_last_runs() -> Dict[str, datetime]:
+        last_runs = BaseModel.db().hgetall(Scheduler.LAST_RUN_KEY)
+        return {name: datetime.fromisoformat(i) for name, i in last_runs.items()}
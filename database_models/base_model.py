@@ -1,7 +1,220 @@
-from redis_om import JsonModel, EmbeddedJsonModel
+import itertools
+from typing import Any, Iterator, List, Optional, Type, TypeVar
+
+import pydantic
+from redis_om import JsonModel, EmbeddedJsonModel, NotFoundError
+from redis_om.model.encoders import jsonable_encoder
+from redis_om.model.model import (
+    convert_base64_to_bytes,
+    convert_datetime_to_timestamp,
+    convert_timestamp_to_datetime,
+)
+
+from database_models.db_executor import DbExecutor
+from database_models.identity_map import IdentityMap
+
+Model = TypeVar("Model", bound="BaseModel")
+
+DEFAULT_CHUNK_SIZE = 500
 
 
 class BaseModel(JsonModel):
+    @classmethod
+    def load(cls: Type[Model], pk: Any) -> Optional[Model]:
+        """
+        ищет модель по первичному ключу через identity map текущего апдейта
+        """
+        identity_map = IdentityMap.current()
+        if identity_map is None:
+            return cls.fetch(pk)
+
+        return identity_map.get_or_load(cls.make_primary_key(pk), lambda: cls.fetch(pk))
+
+    @classmethod
+    async def aload(cls: Type[Model], pk: Any) -> Optional[Model]:
+        """
+        load, не блокирующий event loop
+        """
+        return await DbExecutor.run(cls.load, pk)
+
+    @classmethod
+    async def afind(cls: Type[Model], *expressions) -> List[Model]:
+        """
+        find().all() через identity map, не блокирующий event loop
+        """
+        return await DbExecutor.run(lambda: cls.track(cls.find(*expressions).all()))
+
+    @classmethod
+    def fetch(cls: Type[Model], pk: Any) -> Optional[Model]:
+        try:
+            return cls.get(pk)
+        except NotFoundError:
+            return None
+
+    @classmethod
+    def track(cls: Type[Model], instances: List[Model]) -> List[Model]:
+        """
+        подменяет результаты find() объектами, которые уже есть в identity map
+        """
+        identity_map = IdentityMap.current()
+        if identity_map is None:
+            return instances
+
+        return [identity_map.track(i) for i in instances]
+
+    @classmethod
+    def untrack(cls: Type[Model], instances: List[Model]):
+        identity_map = IdentityMap.current()
+        if identity_map is None:
+            return
+
+        for instance in instances:
+            identity_map.forget(instance.key())
+
+    @classmethod
+    def iterate_chunks(
+        cls: Type[Model], *expressions, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[List[Model]]:
+        """
+        отдает выборку страницами по chunk_size, не держа в памяти ее целиком.
+        фильтры выполняются в RediSearch, страницы сортируются по первичному ключу,
+        поэтому сохранение моделей во время обхода не сбивает смещение.
+        поля, по которым идет фильтр, во время обхода менять нельзя
+        """
+        query = cls.find(*expressions).sort_by(cls._meta.primary_key.name)
+        offset = 0
+
+        while True:
+            chunk = query.page(offset, chunk_size)
+            if chunk:
+                yield chunk
+
+            if len(chunk) < chunk_size:
+                return
+
+            offset += chunk_size
+
+    @classmethod
+    def iterate(
+        cls: Type[Model], *expressions, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[Model]:
+        for chunk in cls.iterate_chunks(*expressions, chunk_size=chunk_size):
+            yield from chunk
+
+    @classmethod
+    def scan_chunks(
+        cls: Type[Model], chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[List[Model]]:
+        """
+        отдает все документы модели страницами, находя ключи через SCAN.
+        в отличие от iterate_chunks не зависит от RediSearch: после того как
+        Migrator().run() пересоздал индекс, он еще какое-то время строится
+        и find() видит не все документы. фильтровать должен вызывающий
+        """
+        pks = cls.all_pks()
+
+        while True:
+            chunk_pks = list(itertools.islice(pks, chunk_size))
+            if not chunk_pks:
+                return
+
+            pipeline = cls.db().pipeline(transaction=False)
+            for pk in chunk_pks:
+                pipeline.json().get(cls.make_key(pk))
+
+            chunk = [
+                cls.__from_document(pk, document)
+                for pk, document in zip(chunk_pks, pipeline.execute())
+                if document is not None
+            ]
+            if chunk:
+                yield chunk
+
+    @classmethod
+    def __from_document(cls: Type[Model], pk: Any, document: dict) -> Model:
+        """
+        то же, что делает get с прочитанным документом
+        """
+        document[cls._meta.primary_key.name] = pk
+        document = convert_timestamp_to_datetime(document, cls.model_fields)
+        document = convert_base64_to_bytes(document, cls.model_fields)
+        return cls.model_validate(document)
+
+    def save(self, pipeline=None, **kwargs):
+        result = super().save(pipeline, **kwargs)
+
+        identity_map = IdentityMap.current()
+        if identity_map is not None:
+            identity_map.remember(self)
+
+        return result
+
+    async def asave(self, pipeline=None, **kwargs):
+        return await DbExecutor.run(self.save, pipeline, **kwargs)
+
+    def commit(self):
+        """
+        сохраняет через активный BatchWriter, если он есть, иначе сразу
+        """
+        from database_models.batch_writer import BatchWriter
+
+        writer = BatchWriter.current()
+        if writer is None:
+            self.save()
+            return
+
+        writer.save(self)
+
+    @staticmethod
+    def encode_value(value: Any) -> Any:
+        """
+        кодирует значение так же, как save: даты становятся timestamp
+        """
+        if isinstance(value, list):
+            return [BaseModel.encode_value(i) for i in value]
+        if isinstance(value, pydantic.BaseModel):
+            value = value.model_dump()
+        return jsonable_encoder(convert_datetime_to_timestamp(value))
+
+    def set_path(self, path: str, value: Any, pipeline=None):
+        """
+        JSON.SET одного пути вместо перезаписи всего документа.
+        объект в памяти меняет вызывающий
+        """
+        db = pipeline if pipeline is not None else self.db()
+        db.json().set(self.key(), path, BaseModel.encode_value(value))
+
+    def append_path(self, path: str, *values: Any, pipeline=None):
+        db = pipeline if pipeline is not None else self.db()
+        db.json().arrappend(
+            self.key(), path, *[BaseModel.encode_value(i) for i in values]
+        )
+
+    def pop_path(self, path: str, index: int = -1, pipeline=None):
+        db = pipeline if pipeline is not None else self.db()
+        db.json().arrpop(self.key(), path, index)
+
+    def commit_path(self, path: str, value: Any):
+        """
+        set_path через активный BatchWriter, если он есть, иначе сразу
+        """
+        self.__commit_update(lambda pipeline: self.set_path(path, value, pipeline))
+
+    def commit_append(self, path: str, *values: Any):
+        self.__commit_update(
+            lambda pipeline: self.append_path(path, *values, pipeline=pipeline)
+        )
+
+    def __commit_update(self, write):
+        from database_models.batch_writer import BatchWriter
+
+        writer = BatchWriter.current()
+        if writer is None:
+            write(None)
+            return
+
+        writer.update(self, write)
+
     class Meta:
         global_key_prefix = "submgr"
         model_key_prefix = "base"
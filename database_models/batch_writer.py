@@ -0,0 +1,108 @@
+import logging
+import time
+from contextvars import ContextVar, Token
+from typing import Callable, Dict, List, Optional, Tuple
+
+from redis.client import Pipeline
+
+from database_models.base_model import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    копит сохранения моделей и пишет их в редис пайплайнами по batch_size штук.
+    модель, сохраненная несколько раз до сброса, пишется один раз.
+    изменения отдельных путей JSON пропускаются, если модель и так пишется целиком
+    """
+
+    DEFAULT_BATCH_SIZE = 500
+
+    name: str
+    batch_size: int
+    transaction: bool
+    written: int
+
+    def __init__(
+        self,
+        name: str = "BatchWriter",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        transaction: bool = True,
+    ):
+        self.name = name
+        self.batch_size = batch_size
+        self.transaction = transaction
+        self.written = 0
+        self.__pending: Dict[str, BaseModel] = {}
+        self.__updates: List[Tuple[BaseModel, Callable[[Pipeline], None]]] = []
+        self.__started = time.monotonic()
+        self.__token: Optional[Token] = None
+
+    @staticmethod
+    def current() -> Optional["BatchWriter"]:
+        return _current_batch_writer.get()
+
+    def save(self, model: BaseModel):
+        self.__pending[model.key()] = model
+
+        if len(self.__pending) + len(self.__updates) >= self.batch_size:
+            self.flush()
+
+    def update(self, model: BaseModel, write: Callable[[Pipeline], None]):
+        """
+        write пишет в пайплайн изменение части документа model
+        """
+        self.__updates.append((model, write))
+
+        if len(self.__pending) + len(self.__updates) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.__pending and not self.__updates:
+            return
+
+        written = len(self.__pending)
+        pipeline = BaseModel.db().pipeline(transaction=self.transaction)
+        for model in self.__pending.values():
+            model.save(pipeline)
+        for model, write in self.__updates:
+            if model.key() not in self.__pending:
+                write(pipeline)
+                written += 1
+        pipeline.execute()
+
+        self.written += written
+        self.__pending.clear()
+        self.__updates.clear()
+
+    @property
+    def documents_per_second(self) -> float:
+        elapsed = time.monotonic() - self.__started
+        return self.written / elapsed if elapsed > 0 else 0.0
+
+    def __enter__(self) -> "BatchWriter":
+        self.__started = time.monotonic()
+        self.__token = _current_batch_writer.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_batch_writer.reset(self.__token)
+        self.__token = None
+
+        # то, что успели накопить до ошибки, все равно пишем
+        self.flush()
+
+        logger.info(f"[{self.name}] {self}")
+
+    def __str__(self) -> str:
+        elapsed = time.monotonic() - self.__started
+        return (
+            f"{self.written} documents written in {elapsed:.2f}s "
+            f"({self.documents_per_second:.1f} documents/s)"
+        )
+
+
+_current_batch_writer: ContextVar[Optional[BatchWriter]] = ContextVar(
+    "batch_writer", default=None
+)
@@ -0,0 +1,149 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import redis_om
+
+from database_models.base_model import BaseModel
+from database_models.user_id_index import UserIdIndex
+from enums.broadcast_status import BroadcastStatus
+
+COUNTER_KEY = "submgr:counter:broadcast"
+RECIPIENTS_KEY_PREFIX = "submgr:broadcast_recipients:"
+
+RECIPIENT_PENDING = "pending"
+RECIPIENT_SENT = "sent"
+RECIPIENT_FAILED = "failed"
+
+# сколько хранится законченная рассылка
+TTL_SECONDS = 30 * 24 * 60 * 60
+
+
+class Broadcast(BaseModel):
+    """
+    рассылка, которая переживает рестарт: текст, курсор по id получателей
+    и статус каждого получателя в отдельном hash.
+    получатель помечается pending до отправки, поэтому после падения
+    ему ничего не отправится повторно
+    """
+
+    id: int = redis_om.Field(index=True, primary_key=True)
+    text: str
+    admin_chat_id: int
+    sub_id: Optional[int] = None
+    status: str
+    cursor: int = 0
+    sent: int = 0
+    failed: int = 0
+    progress_message_id: Optional[int] = None
+    error: Optional[str] = None
+    created: datetime
+
+    @staticmethod
+    def create(
+        text: str, admin_chat_id: int, sub_id: Optional[int] = None
+    ) -> "Broadcast":
+        broadcast = Broadcast(
+            id=Broadcast.db().incr(COUNTER_KEY),
+            text=text,
+            admin_chat_id=admin_chat_id,
+            sub_id=sub_id,
+            status=str(BroadcastStatus.running),
+            created=datetime.now(),
+        )
+        broadcast.save()
+        return broadcast
+
+    @staticmethod
+    def get_latest() -> Optional["Broadcast"]:
+        latest_id = Broadcast.db().get(COUNTER_KEY)
+        if latest_id is None:
+            return None
+
+        return Broadcast.load(int(latest_id))
+
+    @property
+    def effective_status(self) -> BroadcastStatus:
+        return BroadcastStatus.from_str(self.status)
+
+    @property
+    def recipients_key(self) -> str:
+        return f"{RECIPIENTS_KEY_PREFIX}{self.id}"
+
+    def next_recipients(self, chunk_size: int) -> List[int]:
+        """
+        следующие получатели после курсора, по возрастанию id
+        """
+        if self.sub_id is None:
+            return UserIdIndex.get_after(self.cursor, chunk_size)
+
+        from database_models.subscription import Subscription
+
+        sub = Subscription.load(self.sub_id)
+        if sub is None:
+            raise RuntimeError(f"Subscription {self.sub_id} not found")
+
+        return sorted(i for i in sub.billing.members if i > self.cursor)[:chunk_size]
+
+    def claim(self, recipients: List[int]) -> List[int]:
+        """
+        помечает получателей pending и возвращает тех, кому еще ничего не слали
+        """
+        pipeline = self.db().pipeline(transaction=True)
+        for recipient in recipients:
+            pipeline.hsetnx(self.recipients_key, recipient, RECIPIENT_PENDING)
+
+        claimed = pipeline.execute()
+        return [i for i, is_new in zip(recipients, claimed) if is_new]
+
+    def complete(self, cursor: int, results: List[Tuple[int, bool]]):
+        """
+        записывает результаты отправки и сдвигает курсор одной транзакцией
+        """
+        pipeline = self.db().pipeline(transaction=True)
+        for recipient, ok in results:
+            pipeline.hset(
+                self.recipients_key,
+                recipient,
+                RECIPIENT_SENT if ok else RECIPIENT_FAILED,
+            )
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+
+        self.cursor = cursor
+        self.save(pipeline)
+        pipeline.execute()
+
+    def get_failed_recipients(self, limit: int) -> List[int]:
+        failed = []
+        for recipient, status in self.db().hscan_iter(self.recipients_key):
+            if status != RECIPIENT_FAILED:
+                continue
+
+            failed.append(int(recipient))
+            if len(failed) >= limit:
+                break
+
+        return failed
+
+    @property
+    def unknown(self) -> int:
+        """
+        получатели, на которых рассылка упала: отправилось им или нет, неизвестно
+        """
+        return self.db().hlen(self.recipients_key) - self.sent - self.failed
+
+    def set_status(self, status: BroadcastStatus, error: Optional[str] = None):
+        self.status = str(status)
+        self.error = error
+
+        pipeline = self.db().pipeline(transaction=True)
+        self.save(pipeline)
+        if status is BroadcastStatus.done:
+            self.expire(TTL_SECONDS, pipeline)
+            pipeline.expire(self.recipients_key, TTL_SECONDS)
+        pipeline.execute()
+
+    class Meta:
+        model_key_prefix = "broadcast"
@@ -0,0 +1,43 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DbExecutor:
+    """
+    выполняет синхронные запросы к редису в отдельном пуле потоков,
+    чтобы они не останавливали event loop бота.
+    контекст вызывающего (IdentityMap, BatchWriter) копируется в поток.
+    внутри одного апдейта вызовы нужно ждать по очереди: IdentityMap
+    не рассчитан на доступ из нескольких потоков сразу
+    """
+
+    MAX_WORKERS = 16
+
+    __executor: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def executor() -> ThreadPoolExecutor:
+        if DbExecutor.__executor is None:
+            DbExecutor.__executor = ThreadPoolExecutor(
+                max_workers=DbExecutor.MAX_WORKERS, thread_name_prefix="db"
+            )
+        return DbExecutor.__executor
+
+    @staticmethod
+    async def run(fn: Callable[..., T], *args, **kwargs) -> T:
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            DbExecutor.executor(),
+            functools.partial(context.run, fn, *args, **kwargs),
+        )
+
+    @staticmethod
+    def shutdown():
+        if DbExecutor.__executor is not None:
+            DbExecutor.__executor.shutdown(wait=True)
+            DbExecutor.__executor = None
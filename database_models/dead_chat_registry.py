@@ -0,0 +1,71 @@
+import json
+from datetime import datetime
+from typing import Iterable, Optional, Set, Tuple
+
+from redis.client import Pipeline
+from telegram.error import BadRequest, Forbidden
+
+from database_models.base_model import BaseModel
+
+
+class DeadChatRegistry:
+    """
+    чаты, куда писать бесполезно: бот заблокирован, аккаунт удален и т.п.
+    хранится hash chat_id -> причина и время, запись снимается,
+    когда пользователь снова пишет боту
+    """
+
+    KEY = "submgr:dead_chats"
+
+    # BadRequest бывает и из-за самого сообщения, мертвым чат считаем только по этим
+    DEAD_CHAT_BAD_REQUESTS = (
+        "chat not found",
+        "user not found",
+        "peer_id_invalid",
+        "user is deactivated",
+    )
+
+    @staticmethod
+    def is_dead_chat_error(error: Exception) -> bool:
+        if isinstance(error, Forbidden):
+            return True
+
+        if isinstance(error, BadRequest):
+            message = error.message.lower()
+            return any(i in message for i in DeadChatRegistry.DEAD_CHAT_BAD_REQUESTS)
+
+        return False
+
+    @staticmethod
+    def mark(chat_id: int, reason: str):
+        BaseModel.db().hset(
+            DeadChatRegistry.KEY,
+            chat_id,
+            json.dumps({"reason": reason, "since": datetime.now().isoformat()}),
+        )
+
+    @staticmethod
+    def revive(chat_id: int, pipeline: Optional[Pipeline] = None):
+        db = pipeline if pipeline is not None else BaseModel.db()
+        db.hdel(DeadChatRegistry.KEY, chat_id)
+
+    @staticmethod
+    def get(chat_id: int) -> Optional[Tuple[str, datetime]]:
+        """
+        причина и время, с которого чат считается мертвым
+        """
+        entry = BaseModel.db().hget(DeadChatRegistry.KEY, chat_id)
+        if entry is None:
+            return None
+
+        entry = json.loads(entry)
+        return entry["reason"], datetime.fromisoformat(entry["since"])
+
+    @staticmethod
+    def find_dead(chat_ids: Iterable[int]) -> Set[int]:
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return set()
+
+        entries = BaseModel.db().hmget(DeadChatRegistry.KEY, chat_ids)
+        return {i for i, entry in zip(chat_ids, entries) if entry is not None}
@@ -0,0 +1,85 @@
+from datetime import date
+from typing import Dict, List, Optional
+
+from redis.client import Pipeline
+
+from database_models.base_model import BaseModel
+
+
+class DueInvoiceIndex:
+    """
+    индекс неоплаченных счетов: sorted set с id счетов,
+    score - порядковый номер дня pay_till
+    """
+
+    KEY = "submgr:index:due_invoices"
+    BUILT_KEY = "submgr:index:due_invoices_built"
+
+    @staticmethod
+    def update(invoice, pipeline: Optional[Pipeline] = None):
+        db = pipeline if pipeline is not None else BaseModel.db()
+
+        if invoice.paid:
+            db.zrem(DueInvoiceIndex.KEY, invoice.invoice_id)
+        else:
+            db.zadd(
+                DueInvoiceIndex.KEY, {invoice.invoice_id: invoice.pay_till.toordinal()}
+            )
+
+    @staticmethod
+    def remove(invoice_id: str, pipeline: Optional[Pipeline] = None):
+        db = pipeline if pipeline is not None else BaseModel.db()
+        db.zrem(DueInvoiceIndex.KEY, invoice_id)
+
+    @staticmethod
+    def get_due(dates: List[date]) -> Dict[date, List[str]]:
+        """
+        id неоплаченных счетов с pay_till ровно в каждую из дат, одним запросом
+        """
+        pipeline = BaseModel.db().pipeline(transaction=False)
+        for day in dates:
+            pipeline.zrangebyscore(
+                DueInvoiceIndex.KEY, day.toordinal(), day.toordinal()
+            )
+
+        return dict(zip(dates, pipeline.execute()))
+
+    @staticmethod
+    def rebuild() -> int:
+        """
+        пересобирает индекс по неоплаченным счетам, возвращает их количество
+        """
+        from database_models.invoice import Invoice
+
+        db = BaseModel.db()
+        building_key = f"{DueInvoiceIndex.KEY}:building"
+        db.delete(building_key)
+
+        # на старте индекс Invoice может еще строиться после Migrator().run(),
+        # поэтому счета ищем через SCAN, а не через find()
+        count = 0
+        for invoices in Invoice.scan_chunks():
+            unpaid = [i for i in invoices if not i.paid]
+            if not unpaid:
+                continue
+
+            db.zadd(
+                building_key,
+                {i.invoice_id: i.pay_till.toordinal() for i in unpaid},
+            )
+            count += len(unpaid)
+
+        pipeline = db.pipeline(transaction=True)
+        if count:
+            pipeline.rename(building_key, DueInvoiceIndex.KEY)
+        else:
+            pipeline.delete(DueInvoiceIndex.KEY)
+        pipeline.set(DueInvoiceIndex.BUILT_KEY, 1)
+        pipeline.execute()
+
+        return count
+
+    @staticmethod
+    def ensure_built():
+        if not BaseModel.db().exists(DueInvoiceIndex.BUILT_KEY):
+            DueInvoiceIndex.rebuild()
@@ -0,0 +1,80 @@
+import logging
+from contextvars import ContextVar, Token
+from typing import Callable, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class IdentityMap:
+    """
+    кэш моделей в рамках одного апдейта (или одного прогона сервиса):
+    каждый ключ читается из редиса не больше одного раза,
+    а изменения объекта видны везде, где его достали
+    """
+
+    name: str
+    hits: int
+    misses: int
+
+    def __init__(self, name: str = "IdentityMap"):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.__models: Dict[str, Optional[object]] = {}
+        self.__token: Optional[Token] = None
+
+    @staticmethod
+    def current() -> Optional["IdentityMap"]:
+        return _current_identity_map.get()
+
+    def get_or_load(self, key: str, loader: Callable[[], Optional[T]]) -> Optional[T]:
+        if key in self.__models:
+            self.hits += 1
+            return self.__models[key]
+
+        self.misses += 1
+        instance = loader()
+        self.__models[key] = instance
+        return instance
+
+    def track(self, instance: T) -> T:
+        """
+        возвращает уже известный объект с тем же ключом, если он есть
+        """
+        known = self.__models.get(instance.key())
+        if known is not None:
+            return known
+
+        self.__models[instance.key()] = instance
+        return instance
+
+    def remember(self, instance: T) -> T:
+        """
+        подменяет объект, только если ключ уже читали: сохранения в длинных
+        прогонах не должны копить в памяти все модели подряд
+        """
+        if instance.key() in self.__models:
+            self.__models[instance.key()] = instance
+        return instance
+
+    def forget(self, key: str):
+        self.__models.pop(key, None)
+
+    def __enter__(self) -> "IdentityMap":
+        self.__token = _current_identity_map.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_identity_map.reset(self.__token)
+        self.__token = None
+        logger.info(f"[{self.name}] identity map: {self}")
+
+    def __str__(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses"
+
+
+_current_identity_map: ContextVar[Optional[IdentityMap]] = ContextVar(
+    "identity_map", default=None
+)
@@ -4,18 +4,23 @@
 from datetime import date, timedelta
 from typing import Optional
 
+from redis.client import Pipeline
+
 import redis_om
 
 from database_models.base_model import BaseModel
 
 life_time_in_days: int = 2
 
+# сколько протухший инвайт еще лежит в редисе, прежде чем исчезнуть
+grace_in_days: int = 1
+
 
 class Invite(BaseModel):
     id: str = redis_om.Field(index=True, primary_key=True)
     from_user: int = redis_om.Field(index=True)
-    used: bool
-    issue_date: date
+    used: bool = redis_om.Field(index=True)
+    issue_date: date = redis_om.Field(index=True)
     used_by: Optional[int] = redis_om.Field(index=True)
 
     def is_expired(self) -> bool:
@@ -24,13 +29,41 @@ def is_expired(self) -> bool:
     def get_expiry_date(self) -> date:
         return self.issue_date + timedelta(days=life_time_in_days)
 
+    @property
+    def expires_at(self) -> datetime.datetime:
+        return datetime.datetime.combine(
+            self.get_expiry_date() + timedelta(days=1 + grace_in_days),
+            datetime.time.min,
+        )
+
+    def apply_expiry(self, pipeline: Optional[Pipeline] = None):
+        """
+        неиспользованный инвайт удаляется редисом сам, использованный хранится всегда
+        """
+        db = pipeline if pipeline is not None else self.db()
+
+        if self.used:
+            db.persist(self.key())
+        else:
+            db.expireat(self.key(), self.expires_at)
+
+    def save(self, pipeline=None, **kwargs):
+        result = super().save(pipeline, **kwargs)
+        self.apply_expiry(pipeline)
+        return result
+
     def get_url(self) -> str:
         return f"https://t.me/submgr_bot?start={self.id}"
 
     def use_invite(self, user: int):
         self.used = True
         self.used_by = user
-        self.save()
+
+        pipeline = self.db().pipeline(transaction=True)
+        self.set_path("$.used", self.used, pipeline)
+        self.set_path("$.used_by", self.used_by, pipeline)
+        self.apply_expiry(pipeline)
+        pipeline.execute()
 
     @staticmethod
     def generate_id() -> str:
@@ -1,11 +1,11 @@
-import random
-import string
 from datetime import date
 from typing import List
 
 import redis_om
 
 from database_models.base_model import BaseModel, BaseEmbeddedModel
+from database_models.due_invoice_index import DueInvoiceIndex
+from database_models.invoice_id_allocator import InvoiceIdAllocator
 
 
 class InvoiceSubscriptionInfo(BaseEmbeddedModel):
@@ -22,23 +22,18 @@ class Invoice(BaseModel):
     invoice_id: str = redis_om.Field(index=True, primary_key=True)
     user: int = redis_om.Field(index=True)
     date: date
-    pay_till: date
+    pay_till: date = redis_om.Field(index=True)
     subscriptions: List[InvoiceSubscriptionInfo]
-    paid: bool
+    paid: bool = redis_om.Field(index=True)
 
-    @staticmethod
-    def generate_invoice_id():
-        potential_id = 0
-        found = True
-
-        while found:
-            potential_id = Invoice.__get_random_id()
-            invoices = Invoice.find(Invoice.invoice_id == potential_id).all()
-
-            if not invoices:
-                found = False
+    def save(self, pipeline=None, **kwargs):
+        result = super().save(pipeline, **kwargs)
+        DueInvoiceIndex.update(self, pipeline)
+        return result
 
-        return potential_id
+    @staticmethod
+    def generate_invoice_id() -> str:
+        return InvoiceIdAllocator.next()
 
     @property
     def total_price(self) -> float:
@@ -53,9 +48,5 @@ def has_subscription(self, sub_id: int) -> bool:
                 return True
         return False
 
-    @staticmethod
-    def __get_random_id() -> str:
-        return "".join(random.choices(string.ascii_uppercase + string.digits, k=8))
-
     class Meta:
         model_key_prefix = "invoice"
@@ -0,0 +1,185 @@
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import zstandard
+from redis.client import Pipeline
+
+from database_models.base_model import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class InvoiceArchive:
+    """
+    холодное хранилище оплаченных счетов: файлы JSON lines, сжатые zstd,
+    по одному на месяц выставления счета. файлы только дописываются,
+    счета одного пользователя из одной пачки - отдельный zstd frame.
+    в редисе для каждого пользователя хранятся его архивные счета по дате
+    и место frame каждого счета, так что читаются только нужные frame.
+    ARCHIVE_DIR обязателен и должен быть постоянным томом, общим для всех реплик
+    """
+
+    ROOT: Optional[str] = os.environ.get("ARCHIVE_DIR")
+    USER_INVOICES_KEY_PREFIX = "submgr:archive:user_invoices:"
+    LOCATIONS_KEY_PREFIX = "submgr:archive:locations:"
+    COMPRESSION_LEVEL = 10
+
+    @staticmethod
+    def check():
+        """
+        счета удаляются из редиса после записи в архив,
+        поэтому без каталога для него бот не запускается
+        """
+        if not InvoiceArchive.ROOT:
+            raise RuntimeError(
+                "ARCHIVE_DIR is not set, it must point to a persistent volume "
+                "shared by all replicas"
+            )
+
+        os.makedirs(InvoiceArchive.ROOT, exist_ok=True)
+        if not os.access(InvoiceArchive.ROOT, os.W_OK):
+            raise RuntimeError(f"ARCHIVE_DIR {InvoiceArchive.ROOT} is not writable")
+
+    @staticmethod
+    def user_invoices_key(user_id: int) -> str:
+        """
+        sorted set: id счета, score - порядковый номер дня выставления
+        """
+        return f"{InvoiceArchive.USER_INVOICES_KEY_PREFIX}{user_id}"
+
+    @staticmethod
+    def locations_key(user_id: int) -> str:
+        """
+        hash: id счета -> "месяц:смещение:длина" его frame
+        """
+        return f"{InvoiceArchive.LOCATIONS_KEY_PREFIX}{user_id}"
+
+    @staticmethod
+    def month_path(month: str) -> str:
+        return os.path.join(InvoiceArchive.ROOT, "invoices", f"{month}.jsonl.zst")
+
+    @staticmethod
+    def append(invoices: Iterable, pipeline: Optional[Pipeline] = None):
+        """
+        дописывает счета в файлы их месяцев и дожидается записи на диск.
+        индекс пользователей пишется в pipeline, если он передан
+        """
+        by_month: Dict[str, Dict[int, List]] = {}
+        for invoice in invoices:
+            month = by_month.setdefault(invoice.date.strftime("%Y-%m"), {})
+            month.setdefault(invoice.user, []).append(invoice)
+
+        db = pipeline if pipeline is not None else BaseModel.db()
+
+        for month, by_user in by_month.items():
+            frames = [
+                "".join(f"{i.model_dump_json()}\n" for i in user_invoices)
+                for user_invoices in by_user.values()
+            ]
+            positions = InvoiceArchive.__write_frames(
+                InvoiceArchive.month_path(month), frames
+            )
+
+            # счет, заархивированный повторно после падения, просто
+            # переезжает на новое место
+            for (user_id, user_invoices), (offset, length) in zip(
+                by_user.items(), positions
+            ):
+                location = f"{month}:{offset}:{length}"
+                db.zadd(
+                    InvoiceArchive.user_invoices_key(user_id),
+                    {i.invoice_id: i.date.toordinal() for i in user_invoices},
+                )
+                db.hset(
+                    InvoiceArchive.locations_key(user_id),
+                    mapping={i.invoice_id: location for i in user_invoices},
+                )
+
+    @staticmethod
+    def has_invoices(user_id: int) -> bool:
+        return bool(BaseModel.db().exists(InvoiceArchive.user_invoices_key(user_id)))
+
+    @staticmethod
+    def count(user_id: int) -> int:
+        return BaseModel.db().zcard(InvoiceArchive.user_invoices_key(user_id))
+
+    @staticmethod
+    def get_page(user_id: int, start: int, count: int) -> List:
+        """
+        архивные счета пользователя с start по start + count, новые сначала
+        """
+        db = BaseModel.db()
+        invoice_ids = db.zrevrange(
+            InvoiceArchive.user_invoices_key(user_id), start, start + count - 1
+        )
+        if not invoice_ids:
+            return []
+
+        locations = db.hmget(InvoiceArchive.locations_key(user_id), invoice_ids)
+
+        found = {}
+        for location in set(i for i in locations if i):
+            for invoice in InvoiceArchive.__read_frame(location):
+                found[invoice.invoice_id] = invoice
+
+        return [found[i] for i in invoice_ids if i in found]
+
+    @staticmethod
+    def load(user_id: int, invoice_id: str):
+        location = BaseModel.db().hget(
+            InvoiceArchive.locations_key(user_id), invoice_id
+        )
+        if not location:
+            return None
+
+        for invoice in InvoiceArchive.__read_frame(location):
+            if invoice.invoice_id == invoice_id:
+                return invoice
+        return None
+
+    @staticmethod
+    def __write_frames(path: str, frames: List[str]) -> List[Tuple[int, int]]:
+        """
+        возвращает смещение и длину каждого frame в файле
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressor = zstandard.ZstdCompressor(level=InvoiceArchive.COMPRESSION_LEVEL)
+        compressed = [compressor.compress(i.encode()) for i in frames]
+
+        with open(path, "ab") as file:
+            start = file.tell()
+            try:
+                positions = []
+                for frame in compressed:
+                    positions.append((file.tell(), len(frame)))
+                    file.write(frame)
+                file.flush()
+                os.fsync(file.fileno())
+            except OSError:
+                # недописанные frame не должны остаться в файле
+                file.truncate(start)
+                raise
+
+        return positions
+
+    @staticmethod
+    def __read_frame(location: str) -> List:
+        from database_models.invoice import Invoice
+
+        month, offset, length = location.split(":")
+        path = InvoiceArchive.month_path(month)
+
+        try:
+            with open(path, "rb") as file:
+                file.seek(int(offset))
+                data = zstandard.ZstdDecompressor().decompress(file.read(int(length)))
+        except (OSError, zstandard.ZstdError) as e:
+            logger.error(f"[InvoiceArchive] can't read {path} at {offset}: {e}")
+            return []
+
+        return [
+            Invoice.model_validate_json(line)
+            for line in data.decode().splitlines()
+            if line.strip()
+        ]
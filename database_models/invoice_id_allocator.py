@@ -0,0 +1,46 @@
+from typing import List
+
+from database_models.base_model import BaseModel
+
+
+class InvoiceIdAllocator:
+    """
+    выдает номера счетов по атомарному счетчику в редисе.
+    номер кодируется в base32 Крокфорда (без I, L, O и U) и разбивается дефисом,
+    поэтому не пересекается со старыми случайными id из 8 символов
+    """
+
+    COUNTER_KEY = "submgr:counter:invoice"
+    ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+    LENGTH = 6
+
+    @staticmethod
+    def encode(number: int) -> str:
+        chars = []
+        for _ in range(InvoiceIdAllocator.LENGTH):
+            number, index = divmod(number, len(InvoiceIdAllocator.ALPHABET))
+            chars.append(InvoiceIdAllocator.ALPHABET[index])
+
+        if number:
+            raise OverflowError("Invoice counter is out of range")
+
+        encoded = "".join(reversed(chars))
+        return f"{encoded[:3]}-{encoded[3:]}"
+
+    @staticmethod
+    def next() -> str:
+        return InvoiceIdAllocator.reserve(1)[0]
+
+    @staticmethod
+    def reserve(count: int) -> List[str]:
+        """
+        резервирует сразу count номеров за один INCRBY
+        """
+        if count <= 0:
+            return []
+
+        last = BaseModel.db().incrby(InvoiceIdAllocator.COUNTER_KEY, count)
+        return [
+            InvoiceIdAllocator.encode(number)
+            for number in range(last - count + 1, last + 1)
+        ]
@@ -0,0 +1,171 @@
+from typing import Dict, Optional
+
+from redis.commands.core import Script
+
+from database_models.base_model import BaseModel
+from database_models.membership_index import MembershipIndex
+from database_models.subscription import Subscription
+from enums.membership_result import MembershipResult
+
+
+class MembershipOutcome:
+    result: MembershipResult
+    conflict_sub_id: Optional[int]
+
+    def __init__(self, result: MembershipResult, conflict_sub_id: Optional[int]):
+        self.result = result
+        self.conflict_sub_id = conflict_sub_id
+
+    @property
+    def ok(self) -> bool:
+        return self.result in (MembershipResult.joined, MembershipResult.left)
+
+
+class Membership:
+    """
+    вступление в подписку и выход из нее одним Lua скриптом:
+    проверки мест и forbidden_with, изменение billing.members и MembershipIndex
+    выполняются атомарно, поэтому безопасны при нескольких репликах.
+    документ подписки целиком не перезаписывается
+    """
+
+    # forbidden_with действует в обе стороны и только для активных подписок,
+    # как Subscription.is_forbidden_with. другие подписки пользователя читаются
+    # по ключам не из KEYS, так что скрипт рассчитан на редис без кластера
+    SCRIPT_HELPERS = """
+    local function get(key, path)
+        local value = redis.call('JSON.GET', key, path)
+        if not value then
+            return nil
+        end
+
+        value = cjson.decode(value)[1]
+        if value == cjson.null then
+            return nil
+        end
+        return value
+    end
+    """
+
+    JOIN_SCRIPT = SCRIPT_HELPERS + """
+    local sub_key, user_subs_key = KEYS[1], KEYS[2]
+    local user_id, sub_key_prefix = ARGV[1], ARGV[2]
+
+    if redis.call('EXISTS', sub_key) == 0 then
+        return {'not_found', 0}
+    end
+
+    if get(sub_key, '$.is_active') ~= true then
+        return {'not_active', 0}
+    end
+
+    if redis.call('JSON.ARRINDEX', sub_key, '$.billing.members', user_id)[1] ~= -1 then
+        return {'already_joined', 0}
+    end
+
+    local seats = get(sub_key, '$.billing.total_seats')
+    local members = redis.call('JSON.ARRLEN', sub_key, '$.billing.members')[1]
+    if seats and members >= seats then
+        return {'full', 0}
+    end
+
+    local sub_id = get(sub_key, '$.id')
+
+    local forbidden_with = {}
+    for _, other in ipairs(get(sub_key, '$.forbidden_with') or {}) do
+        forbidden_with[other] = true
+    end
+
+    for _, other in ipairs(redis.call('SMEMBERS', user_subs_key)) do
+        local other_key = sub_key_prefix .. other
+        if get(other_key, '$.is_active') == true then
+            if forbidden_with[tonumber(other)] then
+                return {'forbidden', tonumber(other)}
+            end
+
+            for _, forbidden in ipairs(get(other_key, '$.forbidden_with') or {}) do
+                if forbidden == sub_id then
+                    return {'forbidden', tonumber(other)}
+                end
+            end
+        end
+    end
+
+    redis.call('JSON.ARRAPPEND', sub_key, '$.billing.members', user_id)
+    redis.call('SADD', user_subs_key, sub_id)
+    return {'joined', 0}
+    """
+
+    LEAVE_SCRIPT = SCRIPT_HELPERS + """
+    local sub_key, user_subs_key = KEYS[1], KEYS[2]
+    local user_id = ARGV[1]
+
+    if redis.call('EXISTS', sub_key) == 0 then
+        return {'not_found', 0}
+    end
+
+    local sub_id = get(sub_key, '$.id')
+    local index = redis.call('JSON.ARRINDEX', sub_key, '$.billing.members', user_id)[1]
+
+    -- индекс чиним в любом случае
+    redis.call('SREM', user_subs_key, sub_id)
+
+    if index == -1 then
+        return {'not_member', 0}
+    end
+
+    redis.call('JSON.ARRPOP', sub_key, '$.billing.members', index)
+    return {'left', 0}
+    """
+
+    __scripts: Dict[str, Script] = {}
+
+    @staticmethod
+    def join(sub: Subscription, user_id: int) -> MembershipOutcome:
+        outcome = Membership.__execute(
+            Membership.JOIN_SCRIPT,
+            sub,
+            user_id,
+            Subscription.make_primary_key(""),
+        )
+
+        if outcome.ok and user_id not in sub.billing.members:
+            sub.billing.members.append(user_id)
+
+        return outcome
+
+    @staticmethod
+    def leave(sub: Subscription, user_id: int) -> MembershipOutcome:
+        outcome = Membership.__execute(Membership.LEAVE_SCRIPT, sub, user_id)
+
+        if outcome.ok and user_id in sub.billing.members:
+            sub.billing.members.remove(user_id)
+
+        return outcome
+
+    @staticmethod
+    def __execute(
+        script: str, sub: Subscription, user_id: int, *args
+    ) -> MembershipOutcome:
+        from database_models.subscription_catalog import SubscriptionCatalog
+
+        result, conflict_sub_id = Membership.__script(script)(
+            keys=[sub.key(), MembershipIndex.key(user_id)], args=[user_id, *args]
+        )
+
+        outcome = MembershipOutcome(
+            MembershipResult.from_str(result), int(conflict_sub_id) or None
+        )
+        if outcome.ok:
+            SubscriptionCatalog.invalidate()
+
+        return outcome
+
+    @staticmethod
+    def __script(source: str) -> Script:
+        """
+        скрипты регистрируются один раз, дальше Script вызывает их по EVALSHA
+        """
+        if source not in Membership.__scripts:
+            Membership.__scripts[source] = BaseModel.db().register_script(source)
+        return Membership.__scripts[source]
@@ -0,0 +1,63 @@
+from typing import List, Optional
+
+from redis.client import Pipeline
+
+from database_models.base_model import BaseModel
+
+
+class MembershipIndex:
+    """
+    обратный индекс участников: для каждого пользователя
+    хранится set с id подписок, в которых он состоит
+    """
+
+    KEY_PREFIX = "submgr:index:user_subs:"
+    BUILT_KEY = "submgr:index:user_subs_built"
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"{MembershipIndex.KEY_PREFIX}{user_id}"
+
+    @staticmethod
+    def get_sub_ids(user_id: int) -> List[int]:
+        members = BaseModel.db().smembers(MembershipIndex.key(user_id))
+        return sorted(int(i) for i in members)
+
+    @staticmethod
+    def add(user_id: int, sub_id: int, pipeline: Optional[Pipeline] = None):
+        db = pipeline if pipeline is not None else BaseModel.db()
+        db.sadd(MembershipIndex.key(user_id), sub_id)
+
+    @staticmethod
+    def remove(user_id: int, sub_id: int, pipeline: Optional[Pipeline] = None):
+        db = pipeline if pipeline is not None else BaseModel.db()
+        db.srem(MembershipIndex.key(user_id), sub_id)
+
+    @staticmethod
+    def rebuild() -> int:
+        """
+        пересобирает индекс по документам подписок, возвращает количество подписок
+        """
+        from database_models.subscription import Subscription
+
+        db = BaseModel.db()
+        subs = Subscription.find().all()
+        stale_keys = list(db.scan_iter(f"{MembershipIndex.KEY_PREFIX}*"))
+
+        pipeline = db.pipeline(transaction=True)
+        if stale_keys:
+            pipeline.delete(*stale_keys)
+
+        for sub in subs:
+            for member in sub.billing.members:
+                MembershipIndex.add(member, sub.id, pipeline)
+
+        pipeline.set(MembershipIndex.BUILT_KEY, 1)
+        pipeline.execute()
+
+        return len(subs)
+
+    @staticmethod
+    def ensure_built():
+        if not BaseModel.db().exists(MembershipIndex.BUILT_KEY):
+            MembershipIndex.rebuild()
@@ -0,0 +1,133 @@
+import logging
+import time
+from typing import Callable, List, Tuple
+
+from redis import WatchError
+
+from database_models.base_model import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class Migrations:
+    """
+    разовые миграции данных. каждая выполняется один раз,
+    выполненные хранятся в set APPLIED_KEY.
+    миграции должны быть идемпотентными: реплики стартуют одновременно
+    """
+
+    APPLIED_KEY = "submgr:migrations"
+
+    @staticmethod
+    def run():
+        db = BaseModel.db()
+
+        for name, migration in Migrations.__all():
+            if db.sismember(Migrations.APPLIED_KEY, name):
+                continue
+
+            started = time.monotonic()
+            migration()
+            db.sadd(Migrations.APPLIED_KEY, name)
+
+            logger.info(
+                f"[Migrations] {name} applied in {time.monotonic() - started:.2f}s"
+            )
+
+    @staticmethod
+    def __all() -> List[Tuple[str, Callable[[], None]]]:
+        return [
+            ("invite_ttl", Migrations.__invite_ttl),
+            ("paid_invoice_index", Migrations.__paid_invoice_index),
+            ("persist_paid_invoices", Migrations.__persist_paid_invoices),
+            ("compact_user_billing", Migrations.__compact_user_billing),
+        ]
+
+    @staticmethod
+    def __invite_ttl():
+        """
+        раньше инвайтам ставил TTL SpoiledInvitesService, теперь его ставит save
+        """
+        from database_models.invite import Invite
+
+        # индекс Invite мог только что пересоздаться и еще строиться,
+        # поэтому инвайты ищем через SCAN, а не через find()
+        for invites in Invite.scan_chunks():
+            pipeline = BaseModel.db().pipeline(transaction=False)
+            for invite in invites:
+                if not invite.used:
+                    pipeline.expireat(invite.key(), invite.expires_at)
+            pipeline.execute()
+
+    @staticmethod
+    def __paid_invoice_index():
+        """
+        заполняла PaidInvoiceIndex для SpoiledInvoicesService. оба удалены,
+        а set индекса удаляет persist_paid_invoices, так что миграция
+        оставлена пустой, чтобы не менять историю
+        """
+
+    @staticmethod
+    def __persist_paid_invoices():
+        """
+        раньше оплаченным счетам ставился TTL, теперь их забирает InvoiceArchiveService
+        """
+        from database_models.invoice import Invoice
+
+        # индекс Invoice мог только что пересоздаться, поэтому SCAN
+        db = BaseModel.db()
+        for invoices in Invoice.scan_chunks():
+            pipeline = db.pipeline(transaction=False)
+            for invoice in invoices:
+                if invoice.paid:
+                    pipeline.persist(invoice.key())
+            pipeline.execute()
+
+        db.delete("submgr:index:paid_invoices")
+
+    @staticmethod
+    def __compact_user_billing():
+        """
+        set_sub_period и set_joined_date раньше дописывали в billing
+        новую запись при каждом вызове
+        """
+        from database_models.user import User
+
+        # индекс User мог только что пересоздаться, поэтому SCAN
+        for users in User.scan_chunks():
+            for user in users:
+                if len(User.compact_billing(user.billing)) != len(user.billing):
+                    Migrations.__compact_billing_of(user.key())
+
+    @staticmethod
+    def __compact_billing_of(key: str):
+        """
+        billing перечитывается и перезаписывается под WATCH,
+        чтобы не затереть параллельные set_sub_period и set_joined_date
+        """
+        from database_models.user import User, UserSubscriptionBilling
+
+        with BaseModel.db().pipeline() as pipeline:
+            while True:
+                try:
+                    pipeline.watch(key)
+
+                    stored = pipeline.json().get(key, "$.billing")
+                    if not stored:
+                        return
+
+                    billing = [
+                        UserSubscriptionBilling.model_validate(i) for i in stored[0]
+                    ]
+                    compacted = User.compact_billing(billing)
+                    if len(compacted) == len(billing):
+                        return
+
+                    pipeline.multi()
+                    pipeline.json().set(
+                        key, "$.billing", BaseModel.encode_value(compacted)
+                    )
+                    pipeline.execute()
+                    return
+                except WatchError:
+                    continue
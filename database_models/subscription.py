@@ -1,7 +1,7 @@
 import datetime
 from datetime import date
 from enum import Enum
-from typing import List, Optional
+from typing import Any, List, Optional
 
 import redis_om
 
@@ -56,7 +56,7 @@ class ShiftType(Enum):
 
 class Subscription(BaseModel):
     id: int = redis_om.Field(index=True, primary_key=True)
-    is_active: bool
+    is_active: bool = redis_om.Field(index=True)
     reserve: bool
     name: str
     type: str
@@ -66,6 +66,34 @@ class Subscription(BaseModel):
     billing: Billing
     info: Info
 
+    @classmethod
+    def fetch(cls, pk: Any) -> Optional["Subscription"]:
+        from database_models.subscription_catalog import SubscriptionCatalog
+
+        return SubscriptionCatalog.get(int(pk))
+
+    def save(self, pipeline=None, **kwargs):
+        from database_models.subscription_catalog import SubscriptionCatalog
+
+        result = super().save(pipeline, **kwargs)
+        SubscriptionCatalog.invalidate(pipeline)
+        return result
+
+    def set_path(self, path: str, value: Any, pipeline=None):
+        from database_models.subscription_catalog import SubscriptionCatalog
+
+        super().set_path(path, value, pipeline)
+        SubscriptionCatalog.invalidate(pipeline)
+
+    def is_forbidden_with(self, other: "Subscription") -> bool:
+        """
+        достаточно, чтобы одна из подписок указала другую в forbidden_with.
+        неактивные подписки проверяет вызывающий
+        """
+        return other.id in (self.forbidden_with or []) or self.id in (
+            other.forbidden_with or []
+        )
+
     @property
     def is_full(self) -> bool:
         return self.billing.total_seats == len(self.billing.members)
@@ -77,7 +105,10 @@ def payday(self, user_id: Optional[int] = None) -> date:
             if not user_id:
                 raise ValueError("User is required for individual subscriptions")
 
-            user: User = User.find(User.id == user_id).all()[0]
+            user: Optional[User] = User.load(user_id)
+            if user is None:
+                raise RuntimeError(f"User {user_id} not found")
+
             billing_date = user.get_sub_period(self.id)
 
             if billing_date < date.today():
@@ -173,10 +204,13 @@ def pure_price_in_eur(self) -> float:
 
     @property
     def price_in_eur(self) -> float:
+        return self.price_per_member(self.pure_price_in_eur)
+
+    def price_per_member(self, pure_price_in_eur: float) -> float:
         try:
-            return self.pure_price_in_eur / float(len(self.billing.members))
+            return pure_price_in_eur / float(len(self.billing.members))
         except ZeroDivisionError:
-            return self.pure_price_in_eur
+            return pure_price_in_eur
 
     @property
     def effective_type(self) -> SubscriptionType:
@@ -189,12 +223,5 @@ def free_slots(self) -> int:
     def calculate_price_in_eur(self, member_amount: int) -> float:
         return self.pure_price_in_eur / float(member_amount)
 
-    def remove_user(self, user: int):
-        try:
-            self.billing.members.remove(user)
-            self.save()
-        except ValueError:
-            pass
-
     class Meta:
         model_key_prefix = "sub"
@@ -0,0 +1,120 @@
+import copy
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import sentry_sdk
+from redis.client import Pipeline
+
+from database_models.base_model import BaseModel
+from database_models.subscription import Subscription
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionCatalog:
+    """
+    кэш всех подписок в памяти процесса.
+    при сохранении подписки версия каталога в редисе увеличивается,
+    и все процессы получают сообщение через pub/sub и перечитывают каталог
+    """
+
+    VERSION_KEY = "submgr:catalog:version"
+    CHANNEL = "submgr:catalog:invalidate"
+
+    # на случай, если сообщение из pub/sub потерялось
+    VERSION_CHECK_INTERVAL_SECONDS = 30
+
+    __subs: Dict[int, Subscription] = {}
+    __version: Optional[str] = None
+    __stale: bool = True
+    __checked_at: float = 0.0
+    __lock = threading.Lock()
+    __listener: Optional[threading.Thread] = None
+
+    @staticmethod
+    def all() -> List[Subscription]:
+        subs = SubscriptionCatalog.__snapshot()
+        return Subscription.track(
+            [copy.deepcopy(sub) for _, sub in sorted(subs.items())]
+        )
+
+    @staticmethod
+    def get(sub_id: int) -> Optional[Subscription]:
+        sub = SubscriptionCatalog.__snapshot().get(sub_id)
+        if sub is None:
+            return None
+        return copy.deepcopy(sub)
+
+    @staticmethod
+    def invalidate(pipeline: Optional[Pipeline] = None):
+        db = pipeline if pipeline is not None else BaseModel.db()
+        db.incr(SubscriptionCatalog.VERSION_KEY)
+        db.publish(SubscriptionCatalog.CHANNEL, "")
+        SubscriptionCatalog.__stale = True
+
+    @staticmethod
+    def start_listener():
+        if SubscriptionCatalog.__listener is not None:
+            return
+
+        pubsub = BaseModel.db().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(
+            **{SubscriptionCatalog.CHANNEL: SubscriptionCatalog.__on_invalidate}
+        )
+        SubscriptionCatalog.__listener = pubsub.run_in_thread(
+            sleep_time=1,
+            daemon=True,
+            exception_handler=SubscriptionCatalog.__on_listener_error,
+        )
+
+    @staticmethod
+    def __on_invalidate(_):
+        SubscriptionCatalog.__stale = True
+
+    @staticmethod
+    def __on_listener_error(e: BaseException, _, __):
+        SubscriptionCatalog.__stale = True
+        sentry_sdk.capture_exception(e)
+        time.sleep(1)
+
+    @staticmethod
+    def __snapshot() -> Dict[int, Subscription]:
+        with SubscriptionCatalog.__lock:
+            now = time.monotonic()
+            if (
+                not SubscriptionCatalog.__stale
+                and now - SubscriptionCatalog.__checked_at
+                > SubscriptionCatalog.VERSION_CHECK_INTERVAL_SECONDS
+            ):
+                version = BaseModel.db().get(SubscriptionCatalog.VERSION_KEY)
+                SubscriptionCatalog.__stale = version != SubscriptionCatalog.__version
+                SubscriptionCatalog.__checked_at = now
+
+            if SubscriptionCatalog.__stale:
+                SubscriptionCatalog.__reload()
+
+            return SubscriptionCatalog.__subs
+
+    @staticmethod
+    def __reload():
+        # сначала сбрасываем флаг и читаем версию, чтобы не потерять
+        # инвалидацию, пришедшую во время загрузки
+        SubscriptionCatalog.__stale = False
+        SubscriptionCatalog.__version = BaseModel.db().get(
+            SubscriptionCatalog.VERSION_KEY
+        )
+        SubscriptionCatalog.__checked_at = time.monotonic()
+
+        try:
+            subs = Subscription.find().all()
+        except Exception:
+            SubscriptionCatalog.__stale = True
+            raise
+
+        SubscriptionCatalog.__subs = {sub.id: sub for sub in subs if sub}
+        logger.info(
+            f"[SubscriptionCatalog] loaded {len(SubscriptionCatalog.__subs)} "
+            f"subscriptions (version {SubscriptionCatalog.__version})"
+        )
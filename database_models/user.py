@@ -1,13 +1,17 @@
 from datetime import date
-from typing import Optional, List
+from typing import Dict, Optional, List
 
+import pydantic
 import redis_om
 import telegram
 
 from database_models.base_model import BaseModel, BaseEmbeddedModel
 from database_models.invite import Invite
 from database_models.invoice import Invoice
+from database_models.membership_index import MembershipIndex
 from database_models.subscription import Subscription
+from database_models.subscription_catalog import SubscriptionCatalog
+from database_models.user_id_index import UserIdIndex
 from enums.list_type import ListType
 
 
@@ -31,12 +35,50 @@ class User(BaseModel):
     ban_reason: Optional[str]
     warnings: int = 0
     billing: List[UserSubscriptionBilling] = []
-    referral: Optional[int] = None
+    referral: Optional[int] = redis_om.Field(index=True, default=None)
+
+    _billing_by_sub: Dict[int, UserSubscriptionBilling] = pydantic.PrivateAttr(
+        default_factory=dict
+    )
+
+    def model_post_init(self, __context):
+        self._billing_by_sub = {i.sub_id: i for i in reversed(self.billing)}
+
+    @property
+    def billing_by_sub(self) -> Dict[int, UserSubscriptionBilling]:
+        """
+        billing по sub_id, строится при загрузке и меняется вместе с billing.
+        у старых документов с повторами берется первая запись
+        """
+        return self._billing_by_sub
+
+    def save(self, pipeline=None, **kwargs):
+        result = super().save(pipeline, **kwargs)
+        UserIdIndex.add(self.id, pipeline)
+        return result
+
+    def get_billing(self, sub_id: int) -> Optional[UserSubscriptionBilling]:
+        return self.billing_by_sub.get(sub_id)
+
+    @staticmethod
+    def compact_billing(
+        billing: List[UserSubscriptionBilling],
+    ) -> List[UserSubscriptionBilling]:
+        """
+        оставляет первую запись каждой подписки, как и billing_by_sub
+        """
+        compacted: Dict[int, UserSubscriptionBilling] = {}
+        for i in billing:
+            compacted.setdefault(i.sub_id, i)
+
+        return list(compacted.values())
 
     def __get_user_subs(self) -> List[Subscription]:
-        subs = [i for i in Subscription.find().all() if i.is_active]
+        subs = [Subscription.load(i) for i in MembershipIndex.get_sub_ids(self.id)]
         output = []
         for sub in subs:
+            if not sub or not sub.is_active:
+                continue
             if self.id not in sub.billing.members:
                 continue
             output.append(sub)
@@ -51,24 +93,32 @@ def get_subs(self, list_type: ListType) -> List[Subscription]:
             case _:
                 raise ValueError("Invalid list type")
 
-    def get_invoices(self) -> List[Invoice]:
-        invoices = Invoice.find(Invoice.user == self.id).all()
+    def get_invoices(self, paid: Optional[bool] = None) -> List[Invoice]:
+        query = Invoice.user == self.id
+        if paid is not None:
+            query &= Invoice.paid == paid
+
+        invoices = Invoice.track(Invoice.find(query).all())
         if not invoices:
             return []
 
         return invoices
 
     def get_invites(self, only_unused: bool = False) -> List[Invite]:
-        invites = Invite.find(Invite.from_user == self.id).all()
-
+        query = Invite.from_user == self.id
         if only_unused:
-            invites = [invite for invite in invites if not invite.used]
+            query &= Invite.used == False
+
+        invites = Invite.track(Invite.find(query).all())
 
         if not invites:
             return []
 
         return invites
 
+    def get_invitees(self) -> List["User"]:
+        return User.track(User.find(User.referral == self.id).all())
+
     def get_display_invites(self) -> List[Invite]:
         invites = self.get_invites()
         invites = [invite for invite in invites if not invite.spoiled]
@@ -76,11 +126,8 @@ def get_display_invites(self) -> List[Invite]:
         return invites
 
     def get_sub_period(self, sub: int) -> date:
-        period = None
-        for i in self.billing:
-            if i.sub_id == sub:
-                period = i.date
-                break
+        billing = self.get_billing(sub)
+        period = billing.date if billing else None
 
         if not period:
             raise RuntimeError(f"Subscription {sub} not found in billing")
@@ -88,27 +135,28 @@ def get_sub_period(self, sub: int) -> date:
         return period
 
     def set_sub_period(self, sub: int, period: date):
-        for i in self.billing:
-            if i.sub_id == sub:
-                i.date = period
-                i.save()
-                break
-
-        self.billing.append(UserSubscriptionBilling(sub_id=sub, date=period))
+        billing = self.get_billing(sub)
+        if billing is not None:
+            billing.date = period
+            self.commit_path(f"$.billing[?(@.sub_id=={sub})].date", period)
+            return
 
-        self.save()
+        billing = UserSubscriptionBilling(sub_id=sub, date=period)
+        self.billing.append(billing)
+        self.billing_by_sub[sub] = billing
+        self.commit_append("$.billing", billing)
 
     def __get_available_subs(self) -> List[Subscription]:
-        subs = Subscription.find().all()
+        subs = SubscriptionCatalog.all()
         all_available_subs: List[Subscription] = []
 
-        user_subs: List[int] = []
+        user_subs: List[Subscription] = []
 
         for sub in subs:
             if not sub.is_active:
                 continue
             if self.id in sub.billing.members:
-                user_subs.append(sub.id)
+                user_subs.append(sub)
                 continue
             if sub.is_full:
                 continue
@@ -117,19 +165,12 @@ def __get_available_subs(self) -> List[Subscription]:
         output = []
 
         for sub in all_available_subs:
-            if not sub.forbidden_with:
-                output.append(sub)
-                continue
-            is_forbid = False
-            for forbidden in sub.forbidden_with:
-                if forbidden in user_subs:
-                    is_forbid = True
-            if not is_forbid:
+            if not any(sub.is_forbidden_with(i) for i in user_subs):
                 output.append(sub)
         return output
 
     def can_access_password_info(self, sub_id: int) -> bool:
-        invoices: List[Invoice] = Invoice.find(Invoice.user == self.id).all()
+        invoices: List[Invoice] = self.get_invoices()
         if not invoices:
             return False
 
@@ -162,10 +203,7 @@ def can_access_password_info(self, sub_id: int) -> bool:
 
     @staticmethod
     def get_by_id(user_id: int) -> Optional["User"]:
-        query = User.find(User.id == user_id).all()
-        if query:
-            return query[0]
-        return None
+        return User.load(user_id)
 
     @staticmethod
     def create_default(user: telegram.User, referral: Optional[int] = None) -> "User":
@@ -177,41 +215,38 @@ def create_default(user: telegram.User, referral: Optional[int] = None) -> "User
         user.save()
         return user
 
-    def can_join_forbidden_with(self, sub_id: int) -> int:
+    def can_join_forbidden_with(self, sub: Subscription) -> int:
         """
         0 if can join
-        else returns subscription id
+        else returns conflicting subscription id
         """
-        subs = self.__get_user_subs()
-
-        if not subs:
-            return 0
-
-        for sub in subs:
-            if sub.forbidden_with is not None and sub_id in sub.forbidden_with:
-                return sub_id
+        for user_sub in self.__get_user_subs():
+            if sub.is_forbidden_with(user_sub):
+                return user_sub.id
         return 0
 
     def ban(self):
         self.banned = True
-        self.save()
+        self.set_path("$.banned", self.banned)
 
     def set_joined_date(self, sub_id: int, joined: Optional[date] = date.today()):
-        for i in self.billing:
-            if i.sub_id == sub_id:
-                i.joined = joined
-                i.save()
-                break
+        billing = self.get_billing(sub_id)
+        if billing is not None:
+            billing.joined = joined
+            self.commit_path(f"$.billing[?(@.sub_id=={sub_id})].joined", joined)
+            return
 
-        self.billing.append(UserSubscriptionBilling(sub_id=sub_id, joined=joined))
-        self.save()
+        billing = UserSubscriptionBilling(sub_id=sub_id, joined=joined)
+        self.billing.append(billing)
+        self.billing_by_sub[sub_id] = billing
+        self.commit_append("$.billing", billing)
 
     def has_invoice(self, sub: Optional[int] = None) -> bool:
         if not sub:
-            return len([i for i in self.get_invoices() if i.paid]) > 0
+            return len(self.get_invoices(paid=True)) > 0
 
         return (
-            len([i for i in self.get_invoices() if i.has_subscription(sub) and i.paid])
+            len([i for i in self.get_invoices(paid=True) if i.has_subscription(sub)])
             > 0
         )
 
@@ -0,0 +1,55 @@
+from typing import List, Optional
+
+from redis.client import Pipeline
+
+from database_models.base_model import BaseModel
+
+
+class UserIdIndex:
+    """
+    id всех пользователей в sorted set, score - сам id.
+    первичный ключ в RediSearch - TAG, фильтровать по нему диапазоном нельзя,
+    поэтому обход пользователей по порядку id идет отсюда
+    """
+
+    KEY = "submgr:index:user_ids"
+    BUILT_KEY = "submgr:index:user_ids_built"
+
+    @staticmethod
+    def add(user_id: int, pipeline: Optional[Pipeline] = None):
+        db = pipeline if pipeline is not None else BaseModel.db()
+        db.zadd(UserIdIndex.KEY, {user_id: user_id})
+
+    @staticmethod
+    def get_after(cursor: int, count: int) -> List[int]:
+        """
+        первые count id больше cursor, по возрастанию
+        """
+        user_ids = BaseModel.db().zrangebyscore(
+            UserIdIndex.KEY, f"({cursor}", "+inf", start=0, num=count
+        )
+        return [int(i) for i in user_ids]
+
+    @staticmethod
+    def rebuild() -> int:
+        """
+        дописывает в индекс всех пользователей, возвращает их количество.
+        пользователи не удаляются, так что старые id чистить не нужно
+        """
+        from database_models.user import User
+
+        db = BaseModel.db()
+        count = 0
+
+        # индекс User на старте может еще строиться, поэтому SCAN
+        for users in User.scan_chunks():
+            db.zadd(UserIdIndex.KEY, {i.id: i.id for i in users})
+            count += len(users)
+
+        db.set(UserIdIndex.BUILT_KEY, 1)
+        return count
+
+    @staticmethod
+    def ensure_built():
+        if not BaseModel.db().exists(UserIdIndex.BUILT_KEY):
+            UserIdIndex.rebuild()
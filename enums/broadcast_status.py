@@ -0,0 +1,27 @@
+from enum import Enum
+
+
+class BroadcastStatus(Enum):
+    running = 0
+    stopped = 1
+    done = 2
+
+    @staticmethod
+    def from_str(status: str) -> "BroadcastStatus":
+        if status == "running":
+            return BroadcastStatus.running
+        elif status == "stopped":
+            return BroadcastStatus.stopped
+        elif status == "done":
+            return BroadcastStatus.done
+        else:
+            raise ValueError(f"Invalid BroadcastStatus: {status}")
+
+    def __str__(self) -> str:
+        match self:
+            case BroadcastStatus.running:
+                return "running"
+            case BroadcastStatus.stopped:
+                return "stopped"
+            case BroadcastStatus.done:
+                return "done"
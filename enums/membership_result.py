@@ -0,0 +1,52 @@
+from enum import Enum
+
+
+class MembershipResult(Enum):
+    joined = 0
+    left = 1
+    already_joined = 2
+    not_member = 3
+    full = 4
+    forbidden = 5
+    not_active = 6
+    not_found = 7
+
+    @staticmethod
+    def from_str(result: str) -> "MembershipResult":
+        if result == "joined":
+            return MembershipResult.joined
+        elif result == "left":
+            return MembershipResult.left
+        elif result == "already_joined":
+            return MembershipResult.already_joined
+        elif result == "not_member":
+            return MembershipResult.not_member
+        elif result == "full":
+            return MembershipResult.full
+        elif result == "forbidden":
+            return MembershipResult.forbidden
+        elif result == "not_active":
+            return MembershipResult.not_active
+        elif result == "not_found":
+            return MembershipResult.not_found
+        else:
+            raise ValueError(f"Invalid MembershipResult: {result}")
+
+    def __str__(self) -> str:
+        match self:
+            case MembershipResult.joined:
+                return "joined"
+            case MembershipResult.left:
+                return "left"
+            case MembershipResult.already_joined:
+                return "already_joined"
+            case MembershipResult.not_member:
+                return "not_member"
+            case MembershipResult.full:
+                return "full"
+            case MembershipResult.forbidden:
+                return "forbidden"
+            case MembershipResult.not_active:
+                return "not_active"
+            case MembershipResult.not_found:
+                return "not_found"
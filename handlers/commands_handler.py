@@ -1,9 +1,19 @@
+import html
+
 import sentry_sdk
 from telegram import Chat
 from telegram.error import TelegramError
 
+from background_services.broadcast_job import BroadcastJob
+from database_models.broadcast import Broadcast
+from database_models.db_executor import DbExecutor
+from database_models.dead_chat_registry import DeadChatRegistry
+from database_models.due_invoice_index import DueInvoiceIndex
+from database_models.membership_index import MembershipIndex
 from database_models.subscription import Subscription
+from database_models.subscription_catalog import SubscriptionCatalog
 from database_models.user import User
+from database_models.user_id_index import UserIdIndex
 from models.bot_context import BotContext
 
 
@@ -64,6 +74,16 @@ async def try_commands(context: BotContext, com: str, arg_list) -> bool:
             return await handle_all_users(
                 context, ctx.update.message.text_html.replace(com, "").strip()
             )
+        elif com == "/broadcast_status":
+            return await handle_broadcast_status(context, arg_list)
+        elif com == "/broadcast_resume":
+            return await handle_broadcast_resume(context, arg_list)
+        elif com == "/rebuild_index":
+            return await handle_rebuild_index(context)
+        elif com == "/reload_catalog":
+            await DbExecutor.run(SubscriptionCatalog.invalidate)
+            await context.send_message("каталог подписок будет перечитан ✅")
+            return False
         else:
             return True
 
@@ -78,26 +98,31 @@ async def try_commands(context: BotContext, com: str, arg_list) -> bool:
 async def handle_subscriptions(
     ctx: BotContext, sub_id: int, markdown_text: str
 ) -> bool:
-    subs = Subscription.find(Subscription.id == sub_id).all()
-    if not subs:
+    sub = await Subscription.aload(sub_id)
+    if not sub:
         await ctx.send_message(f"подписка {sub_id} не найдена 🪡")
         return False
 
-    sub: Subscription = subs[0]
-
     if not sub.billing.members:
         await ctx.send_message("в этой подписке нет участников 🙆‍♀️")
         return False
 
-    for member in sub.billing.members:
-        try:
-            await ctx.send_message(markdown_text, chat_id=member)
-        except Exception as e:
-            await ctx.send_message(f"не удалось отправить сообщение {member}: {e}")
-            sentry_sdk.capture_exception(e)
-            continue
+    await BroadcastJob.start(
+        ctx.context.bot, markdown_text, ctx.update.effective_chat.id, sub.id
+    )
+    return False
 
-    await ctx.send_message("готово ✅")
+
+async def handle_rebuild_index(ctx: BotContext) -> bool:
+    subs_count = await DbExecutor.run(MembershipIndex.rebuild)
+    invoices_count = await DbExecutor.run(DueInvoiceIndex.rebuild)
+    users_count = await DbExecutor.run(UserIdIndex.rebuild)
+    await ctx.send_message(
+        f"индекс участников пересобран по {subs_count} подпискам, "
+        f"индекс счетов - по {invoices_count} неоплаченным счетам, "
+        f"индекс пользователей - по {users_count} пользователям ✅"
+    )
+    return False
 
 
 async def handle_user(ctx: BotContext, user: str, markdown_text: str) -> bool:
@@ -106,14 +131,24 @@ async def handle_user(ctx: BotContext, user: str, markdown_text: str) -> bool:
         await ctx.send_message(f"пользователь {user} не найден 🪡")
         return False
 
-    users = User.find(User.id == chat.id).all()
-    if not users:
+    if not await User.aload(chat.id):
         await ctx.send_message(f"пользователь {user} не найден 🪡")
         return False
 
+    dead_chat = await DbExecutor.run(DeadChatRegistry.get, chat.id)
+    if dead_chat is not None:
+        reason, since = dead_chat
+        await ctx.send_message(
+            f"пользователь {user} недоступен с {since:%d.%m.%Y %H:%M}: "
+            f"{html.escape(reason)} 🪦"
+        )
+        return False
+
     try:
         await ctx.send_message(markdown_text, chat_id=chat.id)
     except Exception as e:
+        if DeadChatRegistry.is_dead_chat_error(e):
+            await DbExecutor.run(DeadChatRegistry.mark, chat.id, str(e))
         await ctx.send_message(
             f"не удалось отправить сообщение "
             f"{f'@{chat.username}' if chat.username else f'{chat.full_name}'}: {e}"
@@ -125,34 +160,27 @@ async def handle_user(ctx: BotContext, user: str, markdown_text: str) -> bool:
 
 
 async def handle_all_users(ctx: BotContext, markdown_text: str) -> bool:
-    users = User.find().all()
-
-    succeed_users = []
-    failed_users = []
-
-    for user in users:
-        chat = await get_chat(ctx, user.id)
+    await BroadcastJob.start(
+        ctx.context.bot, markdown_text, ctx.update.effective_chat.id
+    )
+    return False
 
-        user_log = f"- {user.id} ({user.name})"
 
-        if not chat:
-            failed_users.append(user_log)
-            continue
-        await ctx.send_message(markdown_text, chat_id=chat.id)
-        succeed_users.append(user_log)
+def find_broadcast(arg_list) -> Broadcast:
+    broadcast = Broadcast.load(int(arg_list[0])) if arg_list else Broadcast.get_latest()
+    if broadcast is None:
+        raise RuntimeError("рассылка не найдена")
 
-    message = "готово ✅\n\n"
+    return broadcast
 
-    if failed_users:
-        log = "\n".join(failed_users)
-        message += f"❌ не удалось отправить сообщения:\n{log}\n\n"
 
-    if succeed_users:
-        log = "\n".join(succeed_users)
-        message += f"✅ сообщение успешно отправлено:\n{log}\n\n"
-    else:
-        message += "сообщение никому отправлено не было"
+async def handle_broadcast_status(ctx: BotContext, arg_list) -> bool:
+    broadcast = await DbExecutor.run(find_broadcast, arg_list)
+    await ctx.send_message(await DbExecutor.run(BroadcastJob.report, broadcast))
+    return False
 
-    await ctx.send_message(message)
 
+async def handle_broadcast_resume(ctx: BotContext, arg_list) -> bool:
+    broadcast = await DbExecutor.run(find_broadcast, arg_list)
+    await BroadcastJob.resume(ctx.context.bot, broadcast)
     return False
@@ -1,12 +1,11 @@
 import datetime
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.error import TelegramError
 
 import handlers.menu_handler
 import phrases
+from database_models.db_executor import DbExecutor
 from database_models.invite import Invite, life_time_in_days
-from database_models.user import User
 from enums.list_type import ListType
 from handlers.inline_callback.configurable_callback_handler import (
     handle_configurable_callback,
@@ -16,6 +15,7 @@
 from modules.invoice_module import InvoiceModule
 from modules.subscription_module import SubscriptionModule
 from utils.callback_utils import CallbackList
+from utils.chat_profile_cache import ChatProfileCache
 from utils.datetime_utils import DateTimeUtils
 
 
@@ -75,7 +75,7 @@ async def handle_subscriptions_pagination_buttons(ctx: BotContext) -> bool:
 
     SubscriptionModule.handle_pagination_button_press(callback_from_id, query_data)
 
-    subs = ctx.user.get_subs(list_type)
+    subs = await DbExecutor.run(ctx.user.get_subs, list_type)
 
     new_keyboard = SubscriptionModule.generate_keyboard(
         subs, callback_from_id, list_type
@@ -96,17 +96,38 @@ async def handle_invoices_pagination_buttons(ctx: BotContext) -> bool:
     """
     query = ctx.update.callback_query
     callback_from_id = query.from_user.id
-    user_invoices = ctx.user.get_invoices()
 
     match query.data:
         case CallbackList.invoices_pagination_forward:
             InvoiceModule.current_pages.forward(callback_from_id)
+            archived = False
         case CallbackList.invoices_pagination_backward:
             InvoiceModule.current_pages.backward(callback_from_id)
+            archived = False
+        case CallbackList.invoices_archive_pagination_forward:
+            InvoiceModule.archive_pages.forward(callback_from_id)
+            archived = True
+        case CallbackList.invoices_archive_pagination_backward:
+            InvoiceModule.archive_pages.backward(callback_from_id)
+            archived = True
         case _:
             return True
 
-    new_keyboard = InvoiceModule.generate_keyboard(user_invoices, callback_from_id)
+    if archived:
+        user_invoices, total = await DbExecutor.run(
+            InvoiceModule.get_archive_page, callback_from_id
+        )
+    else:
+        user_invoices = await DbExecutor.run(ctx.user.get_invoices)
+        total = None
+
+    new_keyboard = await DbExecutor.run(
+        InvoiceModule.generate_keyboard,
+        user_invoices,
+        callback_from_id,
+        archived,
+        total,
+    )
 
     text = query.message.text_html
 
@@ -123,11 +144,6 @@ async def handle_invites_pagination_buttons(ctx: BotContext) -> bool:
     """
     query = ctx.update.callback_query
     callback_from_id = query.from_user.id
-    able_to_create_invite = (
-        ctx.user.invite_limit - len(ctx.user.get_invites()) > 0
-        if not ctx.user.has_invoice()
-        else True
-    )
 
     match query.data:
         case CallbackList.invites_pagination_forward:
@@ -137,8 +153,17 @@ async def handle_invites_pagination_buttons(ctx: BotContext) -> bool:
         case _:
             return True
 
+    invites = await DbExecutor.run(ctx.user.get_invites)
+    able_to_create_invite = (
+        ctx.user.invite_limit - len(invites) > 0
+        if not await DbExecutor.run(ctx.user.has_invoice)
+        else True
+    )
+
     new_keyboard = InviteModule.generate_keyboard(
-        ctx.user.get_display_invites(), callback_from_id, able_to_create_invite
+        [invite for invite in invites if not invite.spoiled],
+        callback_from_id,
+        able_to_create_invite,
     )
 
     text = query.message.text_html
@@ -171,6 +196,9 @@ async def handle_common_callbacks(ctx: BotContext) -> bool:
         case CallbackList.invoices:
             await invoices(ctx)
             return False
+        case CallbackList.invoices_archive:
+            await invoices_archive(ctx)
+            return False
         case CallbackList.invites:
             await invites(ctx)
             return False
@@ -185,7 +213,7 @@ async def handle_common_callbacks(ctx: BotContext) -> bool:
 
 
 async def available_subs(ctx: BotContext) -> bool:
-    subs = ctx.user.get_subs(ListType.AVAILABLE_SUBS)
+    subs = await DbExecutor.run(ctx.user.get_subs, ListType.AVAILABLE_SUBS)
     keyboard = SubscriptionModule.generate_keyboard(
         subs, ctx.update.callback_query.from_user.id, ListType.AVAILABLE_SUBS
     )
@@ -198,7 +226,7 @@ async def available_subs(ctx: BotContext) -> bool:
 
 
 async def my_subs(ctx: BotContext) -> bool:
-    subs = ctx.user.get_subs(ListType.MY_SUBS)
+    subs = await DbExecutor.run(ctx.user.get_subs, ListType.MY_SUBS)
     keyboard = SubscriptionModule.generate_keyboard(
         subs, ctx.update.callback_query.from_user.id, ListType.MY_SUBS
     )
@@ -211,9 +239,9 @@ async def my_subs(ctx: BotContext) -> bool:
 
 
 async def invoices(ctx: BotContext) -> bool:
-    invs = ctx.user.get_invoices()
-    keyboard = InvoiceModule.generate_keyboard(
-        invs, ctx.update.callback_query.from_user.id
+    invs = await DbExecutor.run(ctx.user.get_invoices)
+    keyboard = await DbExecutor.run(
+        InvoiceModule.generate_keyboard, invs, ctx.update.callback_query.from_user.id
     )
     await ctx.update_message(
         text="<b>🧾 счета</b>\n\nздесь ты можешь просмотреть свои счета 💳",
@@ -223,12 +251,25 @@ async def invoices(ctx: BotContext) -> bool:
     return False
 
 
+async def invoices_archive(ctx: BotContext) -> bool:
+    user_id = ctx.update.callback_query.from_user.id
+    invs, total = await DbExecutor.run(InvoiceModule.get_archive_page, user_id)
+    keyboard = await DbExecutor.run(
+        InvoiceModule.generate_keyboard, invs, user_id, True, total
+    )
+    await ctx.update_message(
+        text="<b>🗄 архив счетов</b>\n\nздесь лежат старые оплаченные счета 💳",
+        reply=keyboard,
+        message_id=ctx.update.callback_query.message.message_id,
+    )
+    return False
+
+
 async def invites(ctx: BotContext) -> bool:
-    display_invites = ctx.user.get_display_invites()
+    display_invites = await DbExecutor.run(ctx.user.get_display_invites)
+    has_invoice = await DbExecutor.run(ctx.user.has_invoice)
     available_invites = (
-        ctx.user.invite_limit - len(display_invites)
-        if not ctx.user.has_invoice()
-        else 1
+        ctx.user.invite_limit - len(display_invites) if not has_invoice else 1
     )
 
     message = (
@@ -237,23 +278,16 @@ async def invites(ctx: BotContext) -> bool:
         "{invited}\n\nу тебя доступно {invites_count} инвайтов"
     )
 
-    users = [i for i in User.find().all() if i.referral and i.referral == ctx.user.id]
+    users = await DbExecutor.run(ctx.user.get_invitees)
+
+    profiles = await ChatProfileCache.get_many(ctx.context.bot, [i.id for i in users])
 
     invited_users = []
     for invited_user in users:
-        try:
-            user = await ctx.context.bot.get_chat(invited_user.id)
-        except TelegramError:
-            user = None
-
-        if user and user.username:
-            user_mention = f"@{user.username}"
-        elif user and user.full_name:
-            user_mention = f"{user.full_name}"
-        else:
-            user_mention = invited_user.name
-
-        invited_users.append(user_mention)
+        user = profiles[invited_user.id]
+        invited_users.append(
+            user.mention if user and user.mention else invited_user.name
+        )
 
     keyboard = InviteModule.generate_keyboard(
         display_invites, ctx.user.id, available_invites > 0
@@ -267,7 +301,7 @@ async def invites(ctx: BotContext) -> bool:
 
     invites_count_phrase = (
         f"{available_invites} из {ctx.user.invite_limit}"
-        if not ctx.user.has_invoice()
+        if not has_invoice
         else "неограниченное количество"
     )
 
@@ -280,18 +314,18 @@ async def invites(ctx: BotContext) -> bool:
 
 
 async def create_invite(ctx: BotContext) -> bool:
-    if len(ctx.user.get_subs(ListType.MY_SUBS)) < 1:
+    if len(await DbExecutor.run(ctx.user.get_subs, ListType.MY_SUBS)) < 1:
         await ctx.answer_callback_popout(phrases.callback_at_least_one_sub)
         return False
 
-    user_invites = ctx.user.get_invites()
-    if (
-        (ctx.user.invite_limit - len(user_invites)) <= 0
-    ) and not ctx.user.has_invoice():
+    user_invites = await DbExecutor.run(ctx.user.get_invites)
+    if ((ctx.user.invite_limit - len(user_invites)) <= 0) and not await DbExecutor.run(
+        ctx.user.has_invoice
+    ):
         await ctx.answer_callback(phrases.callback_no_invites)
         return False
 
-    invite = Invite.create_invite(ctx.user.id)
+    invite = await DbExecutor.run(Invite.create_invite, ctx.user.id)
     message = (
         f"<b>🔗 инвайт №{invite.id}</b>\n\n<b>приглашение:</b> <code>{invite.get_url()}</code>\n"
         f"<b>действительно до:</b> "
@@ -303,4 +337,4 @@ async def create_invite(ctx: BotContext) -> bool:
     )
 
     await ctx.update_message(message, reply=keyboard)
-    invite.save()
+    await invite.asave()
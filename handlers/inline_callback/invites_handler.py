@@ -24,14 +24,12 @@ async def overview(ctx: BotContext, invite_id: str) -> bool:
     """
     возвращает can_continue
     """
-    invites = Invite.find(Invite.id == invite_id).all()
+    invite = await Invite.aload(invite_id)
 
-    if not invites:
+    if not invite:
         await ctx.answer_callback("этот инвайт недоступен 🚫")
         return False
 
-    invite = invites[0]
-
     if invite.used:
         await ctx.answer_callback("этот инвайт был использован ⚠️")
         return False
@@ -2,7 +2,9 @@
 
 import phrases
 from background_services.reminder_service import ReminderService
+from database_models.db_executor import DbExecutor
 from database_models.invoice import Invoice
+from database_models.invoice_archive import InvoiceArchive
 from models.bot_context import BotContext
 from modules.invoice_module import InvoiceModule
 from utils.callback_utils import ConfigurableCallbackList, CallbackList
@@ -26,6 +28,14 @@ async def handle_invoices_callback(ctx: BotContext, query_data: str) -> bool:
             ctx, ConfigurableCallbackList.invoice_overview.extract_value(query_data)
         )
 
+    if ConfigurableCallbackList.archived_invoice_overview.matches(query_data):
+        return await archived_invoice_overview(
+            ctx,
+            ConfigurableCallbackList.archived_invoice_overview.extract_value(
+                query_data
+            ),
+        )
+
     if ConfigurableCallbackList.invoice_overview_notify.matches(query_data):
         return await ReminderService.remind_invoice(
             ctx,
@@ -64,11 +74,10 @@ async def handle_invoices_callback(ctx: BotContext, query_data: str) -> bool:
     return True
 
 
-def base_output(invoice_id: str) -> InvoiceOutput:
-    invoices = Invoice.find(Invoice.invoice_id == invoice_id).all()
-    if not invoices:
+async def base_output(invoice_id: str) -> InvoiceOutput:
+    invoice = await Invoice.aload(invoice_id)
+    if not invoice:
         raise ValueError("invoice not found")
-    invoice = invoices[0]
     return InvoiceOutput(invoice)
 
 
@@ -78,29 +87,13 @@ async def invoice_overview(ctx: BotContext, invoice_id: str) -> bool:
     """
 
     try:
-        output = base_output(invoice_id)
+        output = await base_output(invoice_id)
     except ValueError:
         await ctx.answer_callback("этого счёта больше нет 🤷‍♀️")
         return False
 
     invoice = output.invoice
-
-    message = f"<b>🧾 счёт №{invoice.invoice_id}</b>\n\n"
-
-    price = f"€<code>{invoice.total_price:.2f}</code>"
-
-    sub_phrase = "\n".join(
-        [InvoiceModule.generate_sub_phrase(i) for i in invoice.subscriptions]
-    )
-
-    message += f"<b>подписки</b>:\n{sub_phrase}\n"
-    message += f"<b>цена</b>: {price}\n"
-    message += (
-        f"<b>счёт выставлен</b>: {DateTimeUtils.day_and_month_in_words(invoice.date)}\n"
-    )
-    message += f"<b>оплатить до</b>: {DateTimeUtils.day_and_month_in_words(invoice.pay_till)}\n\n"
-
-    message += f"<b>статус</b>: {'✅ оплачен' if invoice.paid else '❌ не оплачен'}\n"
+    message = await DbExecutor.run(overview_text, invoice)
 
     keyboard = []
 
@@ -127,12 +120,62 @@ async def invoice_overview(ctx: BotContext, invoice_id: str) -> bool:
     return False
 
 
+async def archived_invoice_overview(ctx: BotContext, invoice_id: str) -> bool:
+    """
+    вовзращает can_continue
+    """
+    invoice = await DbExecutor.run(
+        InvoiceArchive.load, ctx.update.callback_query.from_user.id, invoice_id
+    )
+    if invoice is None:
+        await ctx.answer_callback("этого счёта больше нет 🤷‍♀️")
+        return False
+
+    keyboard = InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(
+                    phrases.go_back, callback_data=CallbackList.invoices_archive
+                )
+            ]
+        ]
+    )
+
+    await ctx.update_message(
+        await DbExecutor.run(overview_text, invoice),
+        keyboard,
+        message_id=ctx.update.callback_query.inline_message_id,
+    )
+    return False
+
+
+def overview_text(invoice: Invoice) -> str:
+    message = f"<b>🧾 счёт №{invoice.invoice_id}</b>\n\n"
+
+    price = f"€<code>{invoice.total_price:.2f}</code>"
+
+    sub_phrase = "\n".join(
+        [InvoiceModule.generate_sub_phrase(i) for i in invoice.subscriptions]
+    )
+
+    message += f"<b>подписки</b>:\n{sub_phrase}\n"
+    message += f"<b>цена</b>: {price}\n"
+    message += (
+        f"<b>счёт выставлен</b>: {DateTimeUtils.day_and_month_in_words(invoice.date)}\n"
+    )
+    message += f"<b>оплатить до</b>: {DateTimeUtils.day_and_month_in_words(invoice.pay_till)}\n\n"
+
+    message += f"<b>статус</b>: {'✅ оплачен' if invoice.paid else '❌ не оплачен'}\n"
+
+    return message
+
+
 async def invoice_pay(ctx: BotContext, invoice_id: str, notify: bool) -> bool:
     """
     вовзращает can_continue
     """
     try:
-        output = base_output(invoice_id)
+        output = await base_output(invoice_id)
     except ValueError:
         await ctx.answer_callback("этого счёта больше нет 🤷‍♀️")
         return False
@@ -191,7 +234,7 @@ async def invoice_pay_confirm(ctx: BotContext, invoice_id: str, notify: bool) ->
     вовзращает can_continue
     """
     try:
-        output = base_output(invoice_id)
+        output = await base_output(invoice_id)
     except ValueError:
         await ctx.answer_callback("этого счёта больше нет 🤷‍♀️")
         return False
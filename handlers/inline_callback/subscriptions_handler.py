@@ -151,11 +151,11 @@ def get_configurable_output(callback_query: str) -> ConfigurableOutput:
 
 def get_sub_info(sub_id: int, user_id: int) -> SubscriptionServiceInfo:
     sub_info = SubscriptionServiceInfo()
-    sub_query = Subscription.find(Subscription.id == sub_id).all()
+    sub = Subscription.load(sub_id)
 
-    if not sub_query:
+    if not sub:
         raise RuntimeError(f"cannot find sub {sub_id}")
 
-    sub_info.sub = sub_query[0]
+    sub_info.sub = sub
     sub_info.in_sub = user_id in sub_info.sub.billing.members
     return sub_info
@@ -1,11 +1,12 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.error import TelegramError
 
 import phrases
+from database_models.db_executor import DbExecutor
 from enums.list_type import ListType
 from models.bot_context import BotContext
 from modules.subscription_module import SubscriptionModule
 from utils.callback_utils import CallbackList
+from utils.chat_profile_cache import ChatProfileCache
 
 
 async def menu_handler(ctx: BotContext) -> bool:
@@ -34,7 +35,7 @@ async def menu_handler(ctx: BotContext) -> bool:
 
 async def available_handler(ctx: BotContext):
     user_id = ctx.update.effective_user.id
-    subs = ctx.user.get_subs(ListType.AVAILABLE_SUBS)
+    subs = await DbExecutor.run(ctx.user.get_subs, ListType.AVAILABLE_SUBS)
     keyboard = SubscriptionModule.generate_keyboard(
         subs, user_id, ListType.AVAILABLE_SUBS
     )
@@ -43,13 +44,13 @@ async def available_handler(ctx: BotContext):
 
 async def active_handler(ctx: BotContext):
     user_id = ctx.update.effective_user.id
-    subs = ctx.user.get_subs(ListType.MY_SUBS)
+    subs = await DbExecutor.run(ctx.user.get_subs, ListType.MY_SUBS)
     keyboard = SubscriptionModule.generate_keyboard(subs, user_id, ListType.MY_SUBS)
     await ctx.send_message(phrases.main_menu_active_bot_answer, reply=keyboard)
 
 
 async def profile_handler(ctx: BotContext, delete_message: bool):
-    subs = ctx.user.get_subs(ListType.MY_SUBS)
+    subs = await DbExecutor.run(ctx.user.get_subs, ListType.MY_SUBS)
 
     keyboard = [
         [
@@ -58,22 +59,13 @@ async def profile_handler(ctx: BotContext, delete_message: bool):
         ],
     ]
 
-    internal_ids: dict[int, str] = {}
-
-    for sub in subs:
-        for bill in ctx.user.billing:
-            if bill.sub_id != sub.id:
-                continue
-            if not bill.internal_id:
-                continue
-            internal_ids[bill.sub_id] = bill.internal_id
-
     if subs:
         subs_phrase = "\n"
 
         for sub in subs:
-            if sub.id in internal_ids:
-                subs_phrase += f"- {sub.name} ({internal_ids[sub.id]})\n"
+            billing = ctx.user.get_billing(sub.id)
+            if billing and billing.internal_id:
+                subs_phrase += f"- {sub.name} ({billing.internal_id})\n"
             else:
                 subs_phrase += f"- {sub.name}\n"
     else:
@@ -92,20 +84,10 @@ async def profile_handler(ctx: BotContext, delete_message: bool):
     referral = ctx.user.referral
 
     if referral:
-        try:
-            user = await ctx.context.bot.get_chat(referral)
-        except TelegramError:
-            user = None
-
-        if user and user.username:
-            user_mention = f"@{user.username}"
-        elif user and user.full_name:
-            user_mention = f"{user.full_name}"
-        else:
-            user_mention = None
-
-        if user_mention:
-            profile += f"<b>тебя пригласил:</b> {user_mention}\n"
+        user = await ChatProfileCache.get(ctx.context.bot, referral)
+
+        if user and user.mention:
+            profile += f"<b>тебя пригласил:</b> {user.mention}\n"
 
     if ctx.user.banned:
         profile += f"<b>заблокирован: {ctx.user.ban_reason}</b>\n"
@@ -1,11 +1,14 @@
 import logging
 import os
+from typing import Optional
 
 import sentry_sdk
+import telegram
 from redis_om import Migrator
 from sentry_sdk.integrations.logging import LoggingIntegration
 from telegram import Update, Bot
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     ContextTypes,
     MessageHandler,
@@ -15,12 +18,23 @@
 
 import phrases
 from background_services.invoice_overwatch import InvoiceOverwatch
+from background_services.invoice_archive_service import InvoiceArchiveService
 from background_services.invoice_service import InvoiceService
+from background_services.leader_election import LeaderElection
 from background_services.reminder_service import ReminderService
 from background_services.revolut_service import RevolutService
-from background_services.spoiled_invites_service import SpoiledInvitesService
-from background_services.spoiled_invoices_service import SpoiledInvoicesService
+from background_services.scheduler import Scheduler
+from database_models.base_model import BaseModel
+from database_models.identity_map import IdentityMap
+from database_models.invoice_archive import InvoiceArchive
+from database_models.db_executor import DbExecutor
+from database_models.dead_chat_registry import DeadChatRegistry
+from database_models.due_invoice_index import DueInvoiceIndex
+from database_models.membership_index import MembershipIndex
+from database_models.migrations import Migrations
+from database_models.subscription_catalog import SubscriptionCatalog
 from database_models.user import User
+from database_models.user_id_index import UserIdIndex
 from handlers.commands_handler import commands_handler
 from handlers.inline_callback.common_callback_handler import handle_callbacks
 from handlers.invite_handler import invite_handler
@@ -28,11 +42,19 @@
 from handlers.typing.typing_handler import typing_handler
 from models.bot_context import BotContext
 from utils import keyboard_utils
+from utils.chat_profile_cache import ChatProfileCache
+from utils.outbound_queue import OutboundRateLimiter
+from utils.user_update_processor import UserUpdateProcessor
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.ERROR
 )
 
+# у библиотек оставляем только ошибки, а статистику, миграции
+# и планировщик бота пишем с INFO
+for app_logger in ("background_services", "database_models", "utils"):
+    logging.getLogger(app_logger).setLevel(logging.INFO)
+
 sentry_logging = LoggingIntegration(
     level=logging.INFO,
     event_level=logging.ERROR,
@@ -46,21 +68,54 @@
 )
 
 
-def get_ctx(update: Update, context: ContextTypes.DEFAULT_TYPE) -> BotContext:
-    ctx = BotContext(update, context, None)
-
-    user = User.find(User.id == update.effective_user.id).all()
-    if not user:
-        ctx.user = None
-    else:
-        ctx.user = user[0]
+async def get_ctx(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, identity_map: IdentityMap
+) -> BotContext:
+    ctx = BotContext(update, context, None, identity_map)
+    ctx.user = await DbExecutor.run(load_update_user, update.effective_user)
 
     return ctx
 
 
+def load_update_user(tg_user: telegram.User) -> Optional[User]:
+    """
+    загружает пользователя апдейта и обновляет сведения о его чате.
+    проверки идут одним pipeline, запись - только если что-то изменилось
+    """
+    user = User.load(tg_user.id)
+
+    pipeline = BaseModel.db().pipeline(transaction=False)
+    pipeline.hexists(DeadChatRegistry.KEY, tg_user.id)
+    pipeline.get(ChatProfileCache.key(tg_user.id))
+    pipeline.ttl(ChatProfileCache.key(tg_user.id))
+    is_dead, profile_entry, profile_ttl = pipeline.execute()
+
+    pipeline = BaseModel.db().pipeline(transaction=False)
+
+    # раз пользователь пишет боту, чат снова живой
+    if is_dead:
+        DeadChatRegistry.revive(tg_user.id, pipeline)
+
+    if not ChatProfileCache.is_fresh(tg_user, profile_entry, profile_ttl):
+        ChatProfileCache.remember(tg_user, pipeline)
+
+    if len(pipeline):
+        pipeline.execute()
+
+    return user
+
+
 async def main_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    ctx = get_ctx(update, context)
+    with IdentityMap(f"update {update.update_id}") as identity_map:
+        await handle_message(await get_ctx(update, context, identity_map))
+
+
+async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    with IdentityMap(f"update {update.update_id}") as identity_map:
+        await handle_callback_query(await get_ctx(update, context, identity_map))
 
+
+async def handle_message(ctx: BotContext):
     # проверялка на инвайты
     if not await invite_handler(ctx):
         return
@@ -84,9 +139,7 @@ async def main_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
-async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    ctx = get_ctx(update, context)
-
+async def handle_callback_query(ctx: BotContext):
     # пошел нахуй
     if ctx.user is None:
         await ctx.answer_callback("ты не авторизирован 🤚")
@@ -97,30 +150,55 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
         return
 
 
-def start_background_tasks(bot_obj: Bot):
-    tasks = [
-        InvoiceService(),
-        ReminderService(bot_obj),
-        InvoiceOverwatch(),
-        SpoiledInvitesService(),
-        SpoiledInvoicesService(),
-        RevolutService(),
-    ]
+def start_background_tasks(bot_obj: Bot) -> Scheduler:
+    election = LeaderElection()
+    election.start()
 
-    for task in tasks:
-        task.start()
+    scheduler = Scheduler(
+        [
+            InvoiceService(),
+            ReminderService(bot_obj),
+            InvoiceOverwatch(),
+            InvoiceArchiveService(),
+            RevolutService(),
+        ],
+        election,
+    )
+    scheduler.start()
+    return scheduler
 
 
-if __name__ == "__main__":
-    token = os.environ["TG_TOKEN"]
+async def post_init(application: Application):
+    application.bot_data["scheduler"] = start_background_tasks(application.bot)
 
-    Migrator().run()
 
-    bot = Bot(token=token)
+async def post_shutdown(application: Application):
+    scheduler: Scheduler = application.bot_data["scheduler"]
+    await scheduler.stop()
+    await scheduler.election.stop()
+    DbExecutor.shutdown()
+
 
-    start_background_tasks(bot)
+if __name__ == "__main__":
+    token = os.environ["TG_TOKEN"]
+    InvoiceArchive.check()
 
-    app = ApplicationBuilder().token(token).build()
+    Migrator().run()
+    Migrations.run()
+    MembershipIndex.ensure_built()
+    DueInvoiceIndex.ensure_built()
+    UserIdIndex.ensure_built()
+    SubscriptionCatalog.start_listener()
+
+    app = (
+        ApplicationBuilder()
+        .token(token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .rate_limiter(OutboundRateLimiter())
+        .concurrent_updates(UserUpdateProcessor())
+        .build()
+    )
     app.add_handler(MessageHandler(filters.ALL, main_handler))
     app.add_handler(CallbackQueryHandler(callback_query_handler))
     app.run_polling()
@@ -7,6 +7,7 @@
 from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
+from database_models.identity_map import IdentityMap
 from database_models.user import User
 
 
@@ -14,6 +15,7 @@ class BotContext:
     update: Update
     context: ContextTypes.DEFAULT_TYPE
     user: Optional[User]
+    identity_map: IdentityMap
 
     @staticmethod
     def can_use_image(logo: str) -> bool:
@@ -24,10 +26,12 @@ def __init__(
         update: Update,
         context: ContextTypes.DEFAULT_TYPE,
         user: Optional[User] = None,
+        identity_map: Optional[IdentityMap] = None,
     ):
         self.update = update
         self.context = context
         self.user = user
+        self.identity_map = identity_map if identity_map else IdentityMap()
 
     async def send_message(
         self,
@@ -1,10 +1,11 @@
-from typing import List
+from typing import List, Optional, Tuple
 
 from redis import RedisError
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
 
 import phrases
 from database_models.invoice import Invoice, InvoiceSubscriptionInfo
+from database_models.invoice_archive import InvoiceArchive
 from database_models.subscription import Subscription
 from enums.period import Period
 from models.pagination_dictionary import PaginationDictionary
@@ -18,18 +19,53 @@ class InvoiceModule:
     ITEMS_PER_PAGE = 4
 
     current_pages: PaginationDictionary[int, int] = PaginationDictionary()
+    archive_pages: PaginationDictionary[int, int] = PaginationDictionary()
+
+    @staticmethod
+    def get_archive_page(user_id: int) -> Tuple[List[Invoice], int]:
+        """
+        архив читается постранично: счета текущей страницы и сколько их всего
+        """
+        page = InvoiceModule.archive_pages.get(user_id, 0)
+        start_index = page * InvoiceModule.ITEMS_PER_PAGE
+        return (
+            InvoiceArchive.get_page(user_id, start_index, InvoiceModule.ITEMS_PER_PAGE),
+            InvoiceArchive.count(user_id),
+        )
 
     @staticmethod
     def generate_keyboard(
-        invoices: List[Invoice], user_id: int
+        invoices: List[Invoice],
+        user_id: int,
+        archived: bool = False,
+        total: Optional[int] = None,
     ) -> InlineKeyboardMarkup:
-        back_button = InlineKeyboardButton(
-            phrases.go_back, callback_data=CallbackList.profile
-        )
+        """
+        для архива invoices - уже нужная страница, а total - число счетов в нем
+        """
+        if archived:
+            back_button = InlineKeyboardButton(
+                phrases.go_back, callback_data=CallbackList.invoices
+            )
+        else:
+            back_button = InlineKeyboardButton(
+                phrases.go_back, callback_data=CallbackList.profile
+            )
+
+        bottom_rows = [[back_button]]
+        if not archived and InvoiceArchive.has_invoices(user_id):
+            bottom_rows.insert(
+                0,
+                [
+                    InlineKeyboardButton(
+                        "🗄 архив", callback_data=CallbackList.invoices_archive
+                    )
+                ],
+            )
 
         if len(invoices) == 0 or not invoices:
             return InlineKeyboardMarkup(
-                [[keyboard_utils.no_elements_button], [back_button]]
+                [[keyboard_utils.no_elements_button], *bottom_rows]
             )
 
         keyboard = []
@@ -37,29 +73,33 @@ def generate_keyboard(
         # Сортировка по ID подписки
         invoices = sorted(invoices, key=lambda x: x.date, reverse=True)
 
-        left_button_callback = CallbackList.invoices_pagination_backward
-        right_button_callback = CallbackList.invoices_pagination_forward
-        overview_callback = ConfigurableCallbackList.invoice_overview
+        if archived:
+            left_button_callback = CallbackList.invoices_archive_pagination_backward
+            right_button_callback = CallbackList.invoices_archive_pagination_forward
+            overview_callback = ConfigurableCallbackList.archived_invoice_overview
+            pages = InvoiceModule.archive_pages
+        else:
+            left_button_callback = CallbackList.invoices_pagination_backward
+            right_button_callback = CallbackList.invoices_pagination_forward
+            overview_callback = ConfigurableCallbackList.invoice_overview
+            pages = InvoiceModule.current_pages
 
-        page = InvoiceModule.current_pages.get(user_id, 0)
+        page = pages.get(user_id, 0)
 
         start_index = page * InvoiceModule.ITEMS_PER_PAGE
         end_index = start_index + InvoiceModule.ITEMS_PER_PAGE
 
+        first_index = start_index if archived else 0
+        last_index = first_index + len(invoices)
+
         for i in range(start_index, end_index, 2):
             row = []
-            for j in range(i, min(i + 2, len(invoices))):
-                invoice = invoices[j]
+            for j in range(i, min(i + 2, last_index)):
+                invoice = invoices[j - first_index]
                 try:
-                    first_sub = (
-                        Subscription.find(
-                            Subscription.id == invoice.subscriptions[0].sub_id
-                        )
-                        .all()[0]
-                        .name
-                    )
-                    sub_name = f" — {first_sub}"
-                    if len(invoice.subscriptions) > 1:
+                    first_sub = Subscription.load(invoice.subscriptions[0].sub_id)
+                    sub_name = f" — {first_sub.name}" if first_sub else ""
+                    if first_sub and len(invoice.subscriptions) > 1:
                         sub_name += f" + {len(invoice.subscriptions) - 1}"
                 except (RedisError, IndexError):
                     sub_name = ""
@@ -71,19 +111,23 @@ def generate_keyboard(
             keyboard.append(row)
 
         pagination = PaginationModule.get_pagination_buttons(
-            invoices, page, right_button_callback, left_button_callback, end_index
+            range(total) if archived else invoices,
+            page,
+            right_button_callback,
+            left_button_callback,
+            end_index,
         )
 
         if pagination:
             keyboard.append(pagination)
 
-        keyboard.append([back_button])
+        keyboard.extend(bottom_rows)
 
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
     def generate_sub_phrase(sub_info: InvoiceSubscriptionInfo) -> str:
-        sub: Subscription = Subscription.find(Subscription.id == sub_info.sub_id)[0]
+        sub: Subscription = Subscription.load(sub_info.sub_id)
 
         if sub.billing.effective_period is Period.monthly:
             date_to_string_method = DateTimeUtils.day_and_month_in_words
@@ -1,16 +1,18 @@
 import datetime
 from typing import Optional, List
 
-from redis_om import NotFoundError
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
 
 import phrases
 import utils.keyboard_utils
 from background_services.invoice_service import InvoiceService
+from database_models.db_executor import DbExecutor
 from database_models.invoice import Invoice
+from database_models.membership import Membership
 from database_models.subscription import Subscription, ShiftType
 from database_models.user import User
 from enums.list_type import ListType
+from enums.membership_result import MembershipResult
 from enums.period import Period
 from enums.subscription_type import SubscriptionType
 from models.bot_context import BotContext
@@ -41,10 +43,6 @@ class SubscriptionModule:
     ITEMS_PER_PAGE = 4
     current_pages: CurrentPagesStorage = CurrentPagesStorage()
 
-    # нужно чтобы два раза не вызывалось и чел не заходил по два раза в подписку
-    joining_users: List[int] = []
-    leaving_users: List[int] = []
-
     @staticmethod
     def __form_base_output() -> SubscriptionModuleOutput:
         output = SubscriptionModuleOutput("", None)
@@ -326,16 +324,10 @@ def faq(sub: Subscription, list_type: ListType) -> SubscriptionModuleOutput:
     async def handle_join_confirm(
         ctx: BotContext, sub: Subscription, list_type: ListType
     ):
-        if ctx.user.id in SubscriptionModule.joining_users:
-            await ctx.answer_callback(phrases.callback_wait)
-            return
-
         if not sub.is_active:
             await ctx.answer_callback("эта подписка недоступна ❌")
             return
 
-        SubscriptionModule.joining_users.append(ctx.user.id)
-
         user = ctx.user
 
         callback = ctx.update.callback_query
@@ -358,22 +350,36 @@ async def handle_join_confirm(
             return
 
         message_id = ctx.update.callback_query.message.id
-        conflict_sub = await SubscriptionModule.get_conflict_sub(ctx.user, sub.id)
-
-        if conflict_sub is Subscription:
-            await ctx.answer_callback_popout(
-                f"❌ ты не можешь вступить в эту подписку, "
-                f'так как ты подписан на "{conflict_sub.name}"'
-            )
-            return
 
-        if conflict_sub is int and conflict_sub != 0:
-            await ctx.answer_callback(f"❌ ты не можешь вступить в эту подписку")
-            return
+        # места, forbidden_with и участие проверяются атомарно в редисе
+        outcome = await DbExecutor.run(Membership.join, sub, user.id)
 
-        if user.id in sub.billing.members:
-            await ctx.answer_callback(phrases.callback_already_joined)
-            return
+        match outcome.result:
+            case MembershipResult.full:
+                await ctx.context.bot.answer_callback_query(
+                    callback_id, text=phrases.callback_sub_is_full
+                )
+                return
+            case MembershipResult.forbidden:
+                conflict_sub = await DbExecutor.run(
+                    Subscription.load, outcome.conflict_sub_id
+                )
+                if conflict_sub:
+                    await ctx.answer_callback_popout(
+                        f"❌ ты не можешь вступить в эту подписку, "
+                        f'так как ты подписан на "{conflict_sub.name}"'
+                    )
+                else:
+                    await ctx.answer_callback(
+                        f"❌ ты не можешь вступить в эту подписку"
+                    )
+                return
+            case MembershipResult.already_joined:
+                await ctx.answer_callback(phrases.callback_already_joined)
+                return
+            case MembershipResult.not_active | MembershipResult.not_found:
+                await ctx.answer_callback("эта подписка недоступна ❌")
+                return
 
         await ctx.update_message(
             text=f"<b>{sub.name}\n\n✅ ты успешно вступил в подписку</b>",
@@ -381,40 +387,29 @@ async def handle_join_confirm(
             message_id=message_id,
         )
 
-        sub.billing.members.append(user.id)
-        sub.save()
-
-        user.set_joined_date(sub.id)
+        await DbExecutor.run(user.set_joined_date, sub.id)
 
         if sub.effective_type is SubscriptionType.group:
             await SubscriptionNotifier.notify_member_joined(ctx, sub.id, user.id)
         else:
-            InvoiceService.invoice_individual_sub_member(sub, user.id)
-
-        SubscriptionModule.joining_users.remove(ctx.user.id)
+            await DbExecutor.run(
+                InvoiceService.invoice_individual_sub_member, sub, user.id
+            )
 
     @staticmethod
     async def handle_leave_confirm(
         ctx: BotContext, sub: Subscription, list_type: ListType
     ):
-        if ctx.user.id in SubscriptionModule.leaving_users:
-            await ctx.answer_callback(phrases.callback_wait)
-            return
-
         if not sub.is_active:
             return SubscriptionModule.not_active()
 
-        SubscriptionModule.leaving_users.append(ctx.user.id)
-
         user = ctx.user
 
-        invoices = Invoice.find((Invoice.user == user.id)).all()
-
         # те инвойсы которые не оплаченные и которые содержат подписку sub.id
         invoices = [
             i
-            for i in invoices
-            if not i.paid and sub.id in [b.sub_id for b in i.subscriptions]
+            for i in await DbExecutor.run(user.get_invoices, False)
+            if i.has_subscription(sub.id)
         ]
 
         if invoices:
@@ -423,27 +418,22 @@ async def handle_leave_confirm(
                     await ctx.answer_callback_popout(
                         "ты не можешь выйти из подписки с неоплаченным счетом 🤑"
                     )
-                    SubscriptionModule.leaving_users.remove(ctx.user.id)
                     return
 
         if (sub.billing.next_invoice_date - datetime.date.today()).days <= 3:
             await ctx.answer_callback(
                 "ты не можешь выйти из подпки за три дня до выставления счета 🤷‍♂️"
             )
-            SubscriptionModule.leaving_users.remove(ctx.user.id)
             return
 
         if sub.billing.min_days:
-            all_user_billings = [
-                i for i in user.billing if i.sub_id == sub.id and i.joined
-            ]
+            billing = user.get_billing(sub.id)
             if (
-                all_user_billings
-                and (datetime.date.today() - all_user_billings[0].joined).days
-                < sub.billing.min_days
+                billing
+                and billing.joined
+                and (datetime.date.today() - billing.joined).days < sub.billing.min_days
             ):
                 await ctx.answer_callback(f"прошло слишком мало времени 🤷‍♂️")
-                SubscriptionModule.leaving_users.remove(ctx.user.id)
                 return
 
         callback_data = (
@@ -456,8 +446,11 @@ async def handle_leave_confirm(
             [[InlineKeyboardButton(phrases.go_back, callback_data=callback_data)]]
         )
 
-        if user.id not in sub.billing.members:
+        outcome = await DbExecutor.run(Membership.leave, sub, user.id)
+
+        if not outcome.ok:
             await ctx.answer_callback(phrases.callback_already_left)
+            return
 
         await ctx.update_message(
             f"<b>{sub.name}\n\n✅ ты вышел из подписки</b>",
@@ -465,16 +458,11 @@ async def handle_leave_confirm(
             message_id=ctx.update.callback_query.message.id,
         )
 
-        sub.billing.members.remove(user.id)
-        sub.save()
-
-        user.set_joined_date(sub.id, None)
+        await DbExecutor.run(user.set_joined_date, sub.id, None)
 
         if sub.effective_type is SubscriptionType.group:
             await SubscriptionNotifier.notify_member_left(ctx, sub.id, user.id)
 
-        SubscriptionModule.leaving_users.remove(ctx.user.id)
-
     @staticmethod
     async def handle_join(ctx: BotContext, sub: Subscription, list_type: ListType):
         if not sub.is_active:
@@ -520,9 +508,9 @@ async def handle_join(ctx: BotContext, sub: Subscription, list_type: ListType):
         )
 
         message_id = ctx.update.callback_query.message.id
-        conflict_sub = await SubscriptionModule.get_conflict_sub(ctx.user, sub.id)
+        conflict_sub = await SubscriptionModule.get_conflict_sub(ctx.user, sub)
 
-        if conflict_sub is Subscription:
+        if isinstance(conflict_sub, Subscription):
             await ctx.answer_callback_popout(
                 f"❌ ты не можешь вступить в эту подписку, "
                 f'так как ты подписан на "{conflict_sub.name}"',
@@ -567,13 +555,9 @@ async def handle_leave(ctx: BotContext, sub: Subscription, list_type: ListType):
             await ctx.answer_callback("эта подписка недоступна ❌")
             return
 
-        invoices: List[Invoice] = Invoice.find(Invoice.user == ctx.user.id).all()
-
         # те инвойсы которые не оплаченные и которые содержат подписку sub.id
-        invoices = [
-            i
-            for i in invoices
-            if not i.paid and sub.id in [b.sub_id for b in i.subscriptions]
+        invoices: List[Invoice] = [
+            i for i in ctx.user.get_invoices(paid=False) if i.has_subscription(sub.id)
         ]
 
         if invoices:
@@ -623,22 +607,19 @@ async def handle_leave(ctx: BotContext, sub: Subscription, list_type: ListType):
         )
 
     @staticmethod
-    async def get_conflict_sub(user: User, sub_id: int) -> Subscription | int:
+    async def get_conflict_sub(user: User, sub: Subscription) -> Subscription | int:
         """
         returns
         Subscription - found conflicted sub
         int other than 0 - conflict sub id if nothing found in db
         0 if nothing found
         """
-        conflict_sub_id = user.can_join_forbidden_with(sub_id)
+        conflict_sub_id = await DbExecutor.run(user.can_join_forbidden_with, sub)
 
         if conflict_sub_id == 0:
             return 0
 
-        try:
-            conflict_sub = Subscription.get(conflict_sub_id)
-        except NotFoundError:
-            conflict_sub = None
+        conflict_sub = await DbExecutor.run(Subscription.load, conflict_sub_id)
 
         if not conflict_sub:
             return conflict_sub_id
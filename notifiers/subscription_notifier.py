@@ -1,8 +1,7 @@
-from telegram.error import TelegramError
-
 from database_models.subscription import Subscription
 from database_models.user import User
 from models.bot_context import BotContext
+from utils.outbound_queue import OutboundQueue
 
 
 class SubscriptionNotifier:
@@ -20,12 +19,11 @@ class SubscriptionNotifier:
 
     @staticmethod
     def __find_sub(sub: int) -> Subscription:
-        subs = Subscription.find(Subscription.id == sub).all()
-        if not subs:
+        subscription = Subscription.load(sub)
+        if not subscription:
             raise RuntimeError(f"Subscription {sub} not found")
 
-        sub: Subscription = subs[0]
-        return sub
+        return subscription
 
     @staticmethod
     def count_with_declension(count: int) -> str:
@@ -66,17 +64,15 @@ async def notify_member_joined(ctx: BotContext, sub_id: int, new_member_id: int)
             )
         )
 
-        for member in sub.billing.members:
-            if member == new_member_id:
-                continue
-
-            if not User.find(User.id == member).all():
-                continue
-
-            try:
-                await ctx.send_message(message, chat_id=member)
-            except TelegramError:
-                pass
+        await OutboundQueue.send_many(
+            ctx.context.bot,
+            [
+                member
+                for member in sub.billing.members
+                if member != new_member_id and User.load(member)
+            ],
+            message,
+        )
 
     @staticmethod
     async def notify_member_left(ctx: BotContext, sub_id: int, member_id: int):
@@ -101,14 +97,12 @@ async def notify_member_left(ctx: BotContext, sub_id: int, member_id: int):
             )
         )
 
-        for member in sub.billing.members:
-            if member == member_id:
-                continue
-
-            if not User.find(User.id == member).all():
-                continue
-
-            try:
-                await ctx.send_message(message, chat_id=member)
-            except TelegramError:
-                pass
+        await OutboundQueue.send_many(
+            ctx.context.bot,
+            [
+                member
+                for member in sub.billing.members
+                if member != member_id and User.load(member)
+            ],
+            message,
+        )
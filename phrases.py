@@ -26,7 +26,6 @@
 callback_no_invites = "ты достиг лимита инвайтов 🙁"
 callback_at_least_one_sub = "инвайт нельзя создать без активных подписок 🛑"
 
-callback_wait = "пожалуйста, подожди обработки предыдущего запроса ⌚"
 
 callback_sub_is_full = "в этой подписке больше нет мест 🫂"
 
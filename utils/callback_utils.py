@@ -40,6 +40,7 @@ class ConfigurableCallbackList:
     available_sub_overview = InlineCallback("avso")
 
     invoice_overview = InlineCallback("invceo")
+    archived_invoice_overview = InlineCallback("invcearch")
     invoice_overview_notify = InlineCallback("invceonotif")
 
     invoice_pay = InlineCallback("invcepay")
@@ -66,6 +67,10 @@ class CallbackList:
     invoices_pagination_forward = "invoices_pagination_forward"
     invoices_pagination_backward = "invoices_pagination_backward"
 
+    invoices_archive = "invoices_archive"
+    invoices_archive_pagination_forward = "invoices_archive_pagination_forward"
+    invoices_archive_pagination_backward = "invoices_archive_pagination_backward"
+
     invites = "invites"
     invites_pagination_forward = "invites_pagination_forward"
     invites_pagination_backward = "invites_pagination_backward"
@@ -0,0 +1,141 @@
+import asyncio
+import json
+from typing import Dict, Iterable, Optional
+
+import telegram
+from redis.client import Pipeline
+from telegram import Bot
+from telegram.error import TelegramError
+
+from database_models.base_model import BaseModel
+from database_models.db_executor import DbExecutor
+
+
+class ChatProfile:
+    username: Optional[str]
+    full_name: Optional[str]
+
+    def __init__(self, username: Optional[str], full_name: Optional[str]):
+        self.username = username
+        self.full_name = full_name
+
+    @property
+    def mention(self) -> Optional[str]:
+        if self.username:
+            return f"@{self.username}"
+
+        return self.full_name or None
+
+
+class ChatProfileCache:
+    """
+    кэш имен пользователей телеграма в редисе. обновляется бесплатно
+    из effective_user каждого апдейта, get_chat вызывается только на промах,
+    и все промахи запрашиваются параллельно
+    """
+
+    KEY_PREFIX = "submgr:chat_profile:"
+    TTL_SECONDS = 24 * 60 * 60
+
+    # если get_chat не удался, не спрашиваем снова хотя бы час
+    MISSING_TTL_SECONDS = 60 * 60
+
+    # не изменившийся профиль перезаписывается, только когда он скоро протухнет
+    REFRESH_TTL_SECONDS = 60 * 60
+
+    @staticmethod
+    def key(chat_id: int) -> str:
+        return f"{ChatProfileCache.KEY_PREFIX}{chat_id}"
+
+    @staticmethod
+    def remember(user: telegram.User, pipeline: Optional[Pipeline] = None):
+        ChatProfileCache.__store(
+            user.id, ChatProfile(user.username, user.full_name), pipeline
+        )
+
+    @staticmethod
+    def is_fresh(user: telegram.User, entry: Optional[str], ttl: int) -> bool:
+        """
+        entry и ttl - GET и TTL ключа профиля, прочитанные вызывающим
+        """
+        profile = ChatProfile(user.username, user.full_name)
+        return (
+            entry == ChatProfileCache.__encode(profile)
+            and ttl > ChatProfileCache.REFRESH_TTL_SECONDS
+        )
+
+    @staticmethod
+    async def get(bot: Bot, chat_id: int) -> Optional[ChatProfile]:
+        return (await ChatProfileCache.get_many(bot, [chat_id]))[chat_id]
+
+    @staticmethod
+    async def get_many(
+        bot: Bot, chat_ids: Iterable[int]
+    ) -> Dict[int, Optional[ChatProfile]]:
+        chat_ids = list(dict.fromkeys(chat_ids))
+        if not chat_ids:
+            return {}
+
+        cached = await DbExecutor.run(
+            BaseModel.db().mget, [ChatProfileCache.key(i) for i in chat_ids]
+        )
+
+        profiles: Dict[int, Optional[ChatProfile]] = {}
+        misses = []
+
+        for chat_id, entry in zip(chat_ids, cached):
+            if entry is None:
+                misses.append(chat_id)
+                continue
+
+            entry = json.loads(entry)
+            profiles[chat_id] = (
+                ChatProfile(entry["username"], entry["full_name"])
+                if entry is not None
+                else None
+            )
+
+        fetched = await asyncio.gather(
+            *[ChatProfileCache.__fetch(bot, i) for i in misses]
+        )
+        profiles.update(zip(misses, fetched))
+
+        return profiles
+
+    @staticmethod
+    async def __fetch(bot: Bot, chat_id: int) -> Optional[ChatProfile]:
+        try:
+            chat = await bot.get_chat(chat_id)
+        except TelegramError:
+            await DbExecutor.run(ChatProfileCache.__store, chat_id, None)
+            return None
+
+        profile = ChatProfile(chat.username, chat.full_name)
+        await DbExecutor.run(ChatProfileCache.__store, chat_id, profile)
+        return profile
+
+    @staticmethod
+    def __store(
+        chat_id: int,
+        profile: Optional[ChatProfile],
+        pipeline: Optional[Pipeline] = None,
+    ):
+        db = pipeline if pipeline is not None else BaseModel.db()
+        db.set(
+            ChatProfileCache.key(chat_id),
+            ChatProfileCache.__encode(profile),
+            ex=(
+                ChatProfileCache.TTL_SECONDS
+                if profile is not None
+                else ChatProfileCache.MISSING_TTL_SECONDS
+            ),
+        )
+
+    @staticmethod
+    def __encode(profile: Optional[ChatProfile]) -> str:
+        if profile is None:
+            return json.dumps(None)
+
+        return json.dumps(
+            {"username": profile.username, "full_name": profile.full_name}
+        )
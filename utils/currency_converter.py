@@ -1,15 +1,34 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
 import requests
 
+from database_models.base_model import BaseModel
 from database_models.revolut_exchange_rate import RevolutExchangeRate
 from enums.currency import Currency
 
 
 class CurrencyConverter:
+    """
+    курсы кэшируются в памяти процесса. RevolutService после записи новых
+    курсов увеличивает версию в редисе, а остальные реплики сверяют ее
+    не чаще раза в VERSION_CHECK_INTERVAL_SECONDS и перечитывают курсы
+    """
+
     URL_TEMPLATE = (
         "https://www.revolut.com/api/exchange/quote?amount={AMOUNT}"
         "&country=LV&fromCurrency={FROM}&isRecipientAmount=false&toCurrency={TO}"
     )
 
+    VERSION_KEY = "submgr:rates:version"
+    VERSION_CHECK_INTERVAL_SECONDS = 60
+
+    __rates: Dict[Currency, float] = {}
+    __version: Optional[str] = None
+    __checked_at: Optional[float] = None
+    __lock = threading.Lock()
+
     @staticmethod
     def get_rate_through_revolut(
         from_currency: Currency, to_currency: Currency
@@ -32,14 +51,72 @@ def get_rate_through_revolut(
 
         return float(rate)
 
+    @staticmethod
+    def invalidate():
+        """
+        вызывается после записи новых курсов, чтобы их перечитали все реплики
+        """
+        BaseModel.db().incr(CurrencyConverter.VERSION_KEY)
+        CurrencyConverter.refresh_rates()
+
+    @staticmethod
+    def refresh_rates():
+        # версию читаем до курсов, чтобы не пропустить обновление во время загрузки
+        version = BaseModel.db().get(CurrencyConverter.VERSION_KEY)
+        rates = RevolutExchangeRate.find().all()
+        with CurrencyConverter.__lock:
+            CurrencyConverter.__rates = {
+                rate.effective_currency: rate.exchange_rate for rate in rates
+            }
+            CurrencyConverter.__version = version
+            CurrencyConverter.__checked_at = time.monotonic()
+
+    @staticmethod
+    def get_rate(currency: Currency) -> float:
+        # курс мог появиться в базе позже, чем мы её прочитали
+        if CurrencyConverter.__is_stale() or currency not in CurrencyConverter.__rates:
+            CurrencyConverter.refresh_rates()
+
+        rate = CurrencyConverter.__rates.get(currency)
+        if rate is None:
+            raise RuntimeError("No currency was found in db")
+
+        return rate
+
+    @staticmethod
+    def __is_stale() -> bool:
+        with CurrencyConverter.__lock:
+            checked_at = CurrencyConverter.__checked_at
+            if checked_at is None:
+                return True
+
+            now = time.monotonic()
+            if now - checked_at < CurrencyConverter.VERSION_CHECK_INTERVAL_SECONDS:
+                return False
+
+            CurrencyConverter.__checked_at = now
+
+        version = BaseModel.db().get(CurrencyConverter.VERSION_KEY)
+        return version != CurrencyConverter.__version
+
     @staticmethod
     def convert_to_eur(amount: float, from_currency: Currency) -> float:
         if from_currency == Currency.EUR:
             return amount
 
-        rates = RevolutExchangeRate.find().all()
-        for rate in rates:
-            if rate.effective_currency == from_currency:
-                return amount * rate.exchange_rate
+        return amount * CurrencyConverter.get_rate(from_currency)
+
+    @staticmethod
+    def convert_many(amounts: List[Tuple[float, Currency]]) -> List[float]:
+        """
+        переводит в евро сразу пачку сумм, курс каждой валюты ищется один раз
+        """
+        rates: Dict[Currency, float] = {Currency.EUR: 1.0}
+
+        output = []
+        for amount, currency in amounts:
+            if currency not in rates:
+                rates[currency] = CurrencyConverter.get_rate(currency)
+            output.append(amount * rates[currency])
 
-        raise RuntimeError("No currency was found in db")
+        return output
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from datetime import timedelta
+from enum import Enum
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from telegram import Bot
+from telegram.constants import ParseMode
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from database_models.db_executor import DbExecutor
+from database_models.dead_chat_registry import DeadChatRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class OutboundPriority(Enum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class TokenBucket:
+    """
+    token bucket без блокировок: reserve забирает токен (можно в долг)
+    и возвращает, сколько секунд подождать, пока он появится
+    """
+
+    rate: float
+    capacity: float
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.__tokens = capacity
+        self.__updated = time.monotonic()
+
+    def __refill(self):
+        now = time.monotonic()
+        self.__tokens = min(
+            self.capacity, self.__tokens + (now - self.__updated) * self.rate
+        )
+        self.__updated = now
+
+    def reserve(self) -> float:
+        self.__refill()
+        self.__tokens -= 1
+        return max(0.0, -self.__tokens / self.rate)
+
+    def pause(self, seconds: float):
+        self.__refill()
+        self.__tokens = min(self.__tokens, 0) - seconds * self.rate
+
+    @property
+    def is_idle(self) -> bool:
+        self.__refill()
+        return self.__tokens >= self.capacity
+
+
+class OutboundRateLimiter(BaseRateLimiter[Dict[str, Any]]):
+    """
+    ограничивает все запросы бота к Telegram: общий лимит на бота
+    и отдельный на каждый чат. на RetryAfter вся очередь ждет и запрос повторяется.
+    массовые запросы идут по одному и пропускают вперед все интерактивные,
+    так что ответы пользователям не стоят в очереди за рассылкой
+    """
+
+    MESSAGES_PER_SECOND = 30
+    PRIVATE_CHAT_MESSAGES_PER_SECOND = 1
+    GROUP_CHAT_MESSAGES_PER_SECOND = 20 / 60
+    CHAT_BURST = 3
+
+    MAX_RETRIES = 3
+    BACKOFF_SECONDS = 1
+
+    # столько бакетов чатов держим, прежде чем выкинуть простаивающие
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(self):
+        self.__global = TokenBucket(
+            OutboundRateLimiter.MESSAGES_PER_SECOND,
+            OutboundRateLimiter.MESSAGES_PER_SECOND,
+        )
+        self.__chats: Dict[Union[int, str], TokenBucket] = {}
+        self.__interactive_waiting = 0
+        self.__bulk_lock = asyncio.Lock()
+
+    async def initialize(self):
+        return
+
+    async def shutdown(self):
+        return
+
+    async def process_request(
+        self,
+        callback: Callable[..., Awaitable[Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> Any:
+        chat_id = data.get("chat_id")
+        priority = (rate_limit_args or {}).get("priority", _current_priority.get())
+
+        for attempt in range(OutboundRateLimiter.MAX_RETRIES + 1):
+            if chat_id is not None:
+                await asyncio.sleep(self.__chat_bucket(chat_id).reserve())
+
+            if priority is OutboundPriority.BULK:
+                await self.__wait_bulk_turn()
+            else:
+                await self.__wait_interactive_turn()
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == OutboundRateLimiter.MAX_RETRIES:
+                    raise
+
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+
+                delay = retry_after + OutboundRateLimiter.BACKOFF_SECONDS * 2**attempt
+                logger.warning(
+                    f"[OutboundRateLimiter] flood control on {endpoint}, "
+                    f"retrying in {delay:.0f}s"
+                )
+                self.__global.pause(delay)
+
+    async def __wait_interactive_turn(self):
+        self.__interactive_waiting += 1
+        try:
+            await asyncio.sleep(self.__global.reserve())
+        finally:
+            self.__interactive_waiting -= 1
+
+    async def __wait_bulk_turn(self):
+        # в долг у общего бакета берет только один массовый запрос за раз
+        async with self.__bulk_lock:
+            while self.__interactive_waiting:
+                await asyncio.sleep(1 / OutboundRateLimiter.MESSAGES_PER_SECOND)
+
+            await asyncio.sleep(self.__global.reserve())
+
+    def __chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self.__chats.get(chat_id)
+        if bucket is not None:
+            return bucket
+
+        if len(self.__chats) >= OutboundRateLimiter.MAX_CHAT_BUCKETS:
+            self.__chats = {k: v for k, v in self.__chats.items() if not v.is_idle}
+
+        is_group = isinstance(chat_id, int) and chat_id < 0
+        bucket = TokenBucket(
+            (
+                OutboundRateLimiter.GROUP_CHAT_MESSAGES_PER_SECOND
+                if is_group
+                else OutboundRateLimiter.PRIVATE_CHAT_MESSAGES_PER_SECOND
+            ),
+            OutboundRateLimiter.CHAT_BURST,
+        )
+        self.__chats[chat_id] = bucket
+        return bucket
+
+
+class DeliveryResult:
+    chat_id: int
+    error: Optional[Exception]
+    skipped: bool
+
+    def __init__(
+        self, chat_id: int, error: Optional[Exception] = None, skipped: bool = False
+    ):
+        self.chat_id = chat_id
+        self.error = error
+        self.skipped = skipped
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.skipped
+
+
+class OutboundQueue:
+    """
+    рассылка сразу многим получателям: запросы уходят параллельно
+    с низким приоритетом, а темп задает OutboundRateLimiter бота.
+    мертвые чаты пропускаются, а новые заносятся в DeadChatRegistry
+    """
+
+    MAX_CONCURRENCY = 30
+
+    @staticmethod
+    async def deliver(
+        jobs: Iterable[Tuple[int, Callable[[], Awaitable[Any]]]],
+    ) -> List[DeliveryResult]:
+        """
+        jobs - пары (чат, функция отправки), результат в том же порядке
+        """
+        jobs = list(jobs)
+        dead_chats = await DbExecutor.run(
+            DeadChatRegistry.find_dead, {chat_id for chat_id, _ in jobs}
+        )
+        semaphore = asyncio.Semaphore(OutboundQueue.MAX_CONCURRENCY)
+
+        async def run(chat_id: int, send: Callable[[], Awaitable[Any]]):
+            if chat_id in dead_chats:
+                return DeliveryResult(chat_id, skipped=True)
+
+            _current_priority.set(OutboundPriority.BULK)
+
+            async with semaphore:
+                try:
+                    await send()
+                except Exception as e:
+                    if DeadChatRegistry.is_dead_chat_error(e):
+                        await DbExecutor.run(DeadChatRegistry.mark, chat_id, str(e))
+                    return DeliveryResult(chat_id, e)
+
+                return DeliveryResult(chat_id)
+
+        return list(
+            await asyncio.gather(*[run(chat_id, send) for chat_id, send in jobs])
+        )
+
+    @staticmethod
+    async def send_many(
+        bot: Bot,
+        chat_ids: Iterable[int],
+        text: str,
+        parse_mode: str = ParseMode.HTML,
+        disable_web_page_preview: bool = True,
+        **kwargs,
+    ) -> List[DeliveryResult]:
+        def job(chat_id: int) -> Callable[[], Awaitable[Any]]:
+            return lambda: bot.send_message(
+                chat_id=chat_id,
+                text=text,
+                parse_mode=parse_mode,
+                disable_web_page_preview=disable_web_page_preview,
+                **kwargs,
+            )
+
+        return await OutboundQueue.deliver([(i, job(i)) for i in chat_ids])
+
+
+_current_priority: ContextVar[OutboundPriority] = ContextVar(
+    "outbound_priority", default=OutboundPriority.INTERACTIVE
+)
@@ -0,0 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class UserUpdateProcessor(BaseUpdateProcessor):
+    """
+    обрабатывает апдейты разных пользователей параллельно,
+    а апдейты одного пользователя - строго по очереди, в порядке прихода.
+    очередь держится в do_process_update, так что апдейт, ждущий своей
+    очереди, уже занимает место среди max_concurrent_updates
+    """
+
+    MAX_CONCURRENT_UPDATES = 32
+
+    def __init__(self, max_concurrent_updates: int = MAX_CONCURRENT_UPDATES):
+        super().__init__(max_concurrent_updates)
+        self.__locks: Dict[int, asyncio.Lock] = {}
+        self.__waiting: Dict[int, int] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable):
+        async with self.__user_turn(UserUpdateProcessor.__user_id(update)):
+            await coroutine
+
+    async def initialize(self):
+        return
+
+    async def shutdown(self):
+        return
+
+    @asynccontextmanager
+    async def __user_turn(self, user_id: Optional[int]) -> AsyncIterator[None]:
+        if user_id is None:
+            yield
+            return
+
+        lock = self.__locks.setdefault(user_id, asyncio.Lock())
+        self.__waiting[user_id] = self.__waiting.get(user_id, 0) + 1
+
+        try:
+            async with lock:
+                yield
+        finally:
+            # замки держим только для пользователей, у которых есть апдейты
+            self.__waiting[user_id] -= 1
+            if not self.__waiting[user_id]:
+                del self.__waiting[user_id]
+                del self.__locks[user_id]
+
+    @staticmethod
+    def __user_id(update: object) -> Optional[int]:
+        if not isinstance(update, Update):
+            return None
+
+        if update.effective_user is not None:
+            return update.effective_user.id
+
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+
+        return None